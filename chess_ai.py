@@ -1,10 +1,84 @@
 from chess_logic import BoardState, PieceColor, PieceType, ChessPiece
+from chess_encoding import encode_move, decode_move, move_from, move_to, NULL_MOVE
+from chess_mate import MateSolver
 import math
 import random
+import time
+
+class SearchAborted(Exception):
+    # Raised inside the search when its time limit or stop event is hit
+    pass
+
+# Bitmask of the files next to each file
+ADJACENT_FILES = [(1 << (col - 1) if col > 0 else 0) | (1 << (col + 1) if col < 7 else 0) for col in range(8)]
+
+QUIESCENCE_DEPTH = 4 # Maximum plies of captures searched past the nominal depth
+SEE_PRUNE_DEPTH = 1 # Losing captures are pruned at this remaining depth and below
+
+EVAL_CACHE_SIZE = 1 << 18
+PAWN_CACHE_SIZE = 1 << 14
+TRANSPOSITION_TABLE_SIZE = 1 << 18
+
+# Transposition table bounds, from the AI's point of view like every search score
+EXACT = 0
+LOWER_BOUND = 1 # The true score is at least the stored one (the search failed high)
+UPPER_BOUND = 2 # The true score is at most the stored one (the search failed low)
+MULTI_PV_LINES = 3
+
+MATE_SEARCH_MOVES = 5 # Longest forced mate, in moves, looked for before the main search
+MATE_SEARCH_TIME = 0.5 # Most seconds a timed search gives the mate solver, and at most a quarter of its time limit
+MATE_SCORE = 1000000 # Score of a forced mate, less the plies it takes
+
+class BoundedCache:
+    # Dict-backed cache that evicts its oldest entry once full, with hit/miss counters
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if key not in self.entries and len(self.entries) >= self.capacity:
+            del self.entries[next(iter(self.entries))] # Dicts keep insertion order, so this is the oldest
+            self.evictions += 1
+        self.entries[key] = value
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {"size": len(self.entries), "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "hit_rate": self.hits / lookups if lookups else 0.0}
 
 class ChessAI:
     def __init__(self, depth: int = 9999):
         self.depth = depth
+        self.eval_cache = BoundedCache(EVAL_CACHE_SIZE) # Full evaluations by (position hash, color)
+        self.pawn_cache = BoundedCache(PAWN_CACHE_SIZE) # Pawn structure by pawn hash
+        # (depth, score, bound, packed best move) by (position hash, AI color); kept between searches
+        self.transposition_table = BoundedCache(TRANSPOSITION_TABLE_SIZE)
+        self.nodes = 0 # Nodes visited by the last search
+        self.deadline = None
+        self.stop_event = None
+        self.path_hashes = set() # Positions from the game history and the current search path
+        self.history_draws = 0 # Draw scores that depended on the game history; such scores are never stored
+        self.mate_solver = MateSolver()
+        self.mate_time = MATE_SEARCH_TIME # Cap on the mate solver's slice of a timed search; 0 turns it off
+        self.mating_line = None # Forced mate found by the last search, as a list of (piece, (row, col))
 
     # Piece values for evaluation function
     # These values are standard, but can be tweaked for different AI personalities
@@ -17,7 +91,56 @@ class ChessAI:
         PieceType.KING: 20000 # King value is high as losing it means losing the game
     }
 
+    # Positional bonus for knights by (row, col); central knights are generally better
+    KNIGHT_POSITIONS = {
+        (0,0): -50, (0,1): -10, (0,2): -10, (0,3): -10, (0,4): -10, (0,5): -10, (0,6): -10, (0,7): -50,
+        (1,0): -10, (1,1):   0, (1,2):   0, (1,3):   0, (1,4):   0, (1,5):   0, (1,6):   0, (1,7): -10,
+        (2,0): -10, (2,1):   0, (2,2):  10, (2,3):  10, (2,4):  10, (2,5):  10, (2,6):   0, (2,7): -10,
+        (3,0): -10, (3,1):   0, (3,2):  10, (3,3):  20, (3,4):  20, (3,5):  10, (3,6):   0, (3,7): -10,
+        (4,0): -10, (4,1):   0, (4,2):  10, (4,3):  20, (4,4):  20, (4,5):  10, (4,6):   0, (4,7): -10,
+        (5,0): -10, (5,1):   0, (5,2):  10, (5,3):  10, (5,4):  10, (5,5):  10, (5,6):   0, (5,7): -10,
+        (6,0): -10, (6,1):   0, (6,2):   0, (6,3):   0, (6,4):   0, (6,5):   0, (6,6):   0, (6,7): -10,
+        (7,0): -50, (7,1): -10, (7,2): -10, (7,3): -10, (7,4): -10, (7,5): -10, (7,6): -10, (7,7): -50
+    }
+
     def evaluate_board(self, board: BoardState, player_color: PieceColor) -> int:
+        key = (board.position_hash, player_color)
+        score = self.eval_cache.get(key)
+        if score is None:
+            score = self._evaluate_board(board, player_color)
+            self.eval_cache.put(key, score)
+        return score
+
+    def evaluate_pawn_structure(self, board: BoardState):
+        # Returns (pawn score from White's point of view, {color: bitmask of files holding that color's pawns})
+        entry = self.pawn_cache.get(board.pawn_hash)
+        if entry is not None:
+            return entry
+
+        pawns = [p for p in board.pieces if p.type == PieceType.PAWN]
+        pawn_files = {PieceColor.WHITE: 0, PieceColor.BLACK: 0}
+        for pawn in pawns:
+            pawn_files[pawn.color] |= 1 << pawn.col
+
+        score = 0
+        for pawn in pawns:
+            # Advanced pawns get a bonus
+            if pawn.color == PieceColor.WHITE:
+                value = (pawn.row - 1) * 5 # Further up the board is better
+            else: # Black
+                value = (6 - pawn.row) * 5 # Further down the board is better
+
+            # Penalty for isolated pawns (no friendly pawns on adjacent files)
+            if not pawn_files[pawn.color] & ADJACENT_FILES[pawn.col]:
+                value -= 20
+
+            score += value if pawn.color == PieceColor.WHITE else -value
+
+        entry = (score, pawn_files)
+        self.pawn_cache.put(board.pawn_hash, entry)
+        return entry
+
+    def _evaluate_board(self, board: BoardState, player_color: PieceColor) -> int:
         score = 0
         for piece in board.pieces:
             value = self.PIECE_VALUES.get(piece.type, 0)
@@ -36,64 +159,14 @@ class ChessAI:
                 else:
                     score -= 10
 
-        # Positional scoring for pawns
-        for r in range(8):
-            for c in range(8):
-                piece = board.get_piece_at(r, c)
-                if piece and piece.type == PieceType.PAWN:
-                    if piece.color == player_color:
-                        # Advanced pawns get a bonus
-                        if piece.color == PieceColor.WHITE:
-                            score += (r - 1) * 5 # Further up the board is better
-                        else: # Black
-                            score += (6 - r) * 5 # Further down the board is better
-                        
-                        # Check for isolated pawns (no friendly pawns on adjacent files)
-                        is_isolated = True
-                        for dc in [-1, 1]:
-                            if 0 <= c + dc <= 7:
-                                for dr in range(8):
-                                    adj_piece = board.get_piece_at(dr, c + dc)
-                                    if adj_piece and adj_piece.type == PieceType.PAWN and adj_piece.color == player_color:
-                                        is_isolated = False
-                                        break
-                            if not is_isolated:
-                                break
-                        if is_isolated:
-                            score -= 20 # Penalty for isolated pawns
-                    else: # Opponent's pawns
-                        if piece.color == PieceColor.WHITE:
-                            score -= (r - 1) * 5
-                        else: # Black
-                            score -= (6 - r) * 5
-                        
-                        is_isolated = True
-                        for dc in [-1, 1]:
-                            if 0 <= c + dc <= 7:
-                                for dr in range(8):
-                                    adj_piece = board.get_piece_at(dr, c + dc)
-                                    if adj_piece and adj_piece.type == PieceType.PAWN and adj_piece.color != player_color:
-                                        is_isolated = False
-                                        break
-                            if not is_isolated:
-                                break
-                        if is_isolated:
-                            score += 20 # Opponent's isolated pawns are good for us
+        # Positional scoring for pawns (advancement, isolated pawns), looked up by pawn placement
+        pawn_score, pawn_files = self.evaluate_pawn_structure(board)
+        score += pawn_score if player_color == PieceColor.WHITE else -pawn_score
 
         # Positional scoring for knights (central knights are generally better)
-        knight_positions = {\
-            (0,0): -50, (0,1): -10, (0,2): -10, (0,3): -10, (0,4): -10, (0,5): -10, (0,6): -10, (0,7): -50,
-            (1,0): -10, (1,1):   0, (1,2):   0, (1,3):   0, (1,4):   0, (1,5):   0, (1,6):   0, (1,7): -10,
-            (2,0): -10, (2,1):   0, (2,2):  10, (2,3):  10, (2,4):  10, (2,5):  10, (2,6):   0, (2,7): -10,
-            (3,0): -10, (3,1):   0, (3,2):  10, (3,3):  20, (3,4):  20, (3,5):  10, (3,6):   0, (3,7): -10,
-            (4,0): -10, (4,1):   0, (4,2):  10, (4,3):  20, (4,4):  20, (4,5):  10, (4,6):   0, (4,7): -10,
-            (5,0): -10, (5,1):   0, (5,2):  10, (5,3):  10, (5,4):  10, (5,5):  10, (5,6):   0, (5,7): -10,
-            (6,0): -10, (6,1):   0, (6,2):   0, (6,3):   0, (6,4):   0, (6,5):   0, (6,6):   0, (6,7): -10,
-            (7,0): -50, (7,1): -10, (7,2): -10, (7,3): -10, (7,4): -10, (7,5): -10, (7,6): -10, (7,7): -50
-        }
         for piece in board.pieces:
             if piece.type == PieceType.KNIGHT:
-                pos_value = knight_positions.get((piece.row, piece.col), 0)
+                pos_value = self.KNIGHT_POSITIONS.get((piece.row, piece.col), 0)
                 if piece.color == player_color:
                     score += pos_value
                 else:
@@ -102,13 +175,7 @@ class ChessAI:
         # Positional scoring for rooks (open files, 7th rank)
         for piece in board.pieces:
             if piece.type == PieceType.ROOK:
-                is_open_file = True
-                for r in range(8):
-                    if r != piece.row:
-                        p = board.get_piece_at(r, piece.col)
-                        if p and p.color == piece.color and p.type == PieceType.PAWN:
-                            is_open_file = False
-                            break
+                is_open_file = not pawn_files[piece.color] & (1 << piece.col) # No own pawns on the rook's file
                 if is_open_file:
                     if piece.color == player_color:
                         score += 30 # Bonus for rook on open file
@@ -145,60 +212,315 @@ class ChessAI:
 
         return score
 
-    def find_best_move(self, board: BoardState, ai_color: PieceColor):
-        best_move = None
-        if ai_color == PieceColor.WHITE:
-            max_eval = -math.inf
-            for piece in board.pieces:
-                if piece.color == ai_color:
-                    for move in board.calculate_possible_moves(piece):
-                        new_board = board.apply_move(piece, move[0], move[1])
-                        eval = self.minimax(new_board, self.depth - 1, -math.inf, math.inf, ai_color, False)
-                        if eval > max_eval:
-                            max_eval = eval
-                            best_move = (piece, move)
-            return best_move
-        else: # AI is Black
-            min_eval = math.inf
-            for piece in board.pieces:
-                if piece.color == ai_color:
-                    for move in board.calculate_possible_moves(piece):
-                        new_board = board.apply_move(piece, move[0], move[1])
-                        eval = self.minimax(new_board, self.depth - 1, -math.inf, math.inf, ai_color, True)
-                        if eval < min_eval:
-                            min_eval = eval
-                            best_move = (piece, move)
-            return best_move
+    def find_best_move(self, board: BoardState, ai_color: PieceColor, mate_time: float = 0):
+        # Fixed-depth search; with mate_time > 0 a forced mate is looked for first, for up to that many seconds
+        self.nodes = 0
+        if self.find_mate(board, ai_color, mate_time):
+            return self.mating_line[0]
+        return self.search_root(board, ai_color, self.depth)[0]
 
-    def minimax(self, board: BoardState, depth: int, alpha: int, beta: int, ai_color: PieceColor, is_maximizing_player: bool) -> int:
-        if depth == 0 or board.is_checkmate(board.current_turn) or board.is_stalemate(board.current_turn):
-            return self.evaluate_board(board, ai_color)
+    def find_mate(self, board: BoardState, ai_color: PieceColor, mate_time: float, stop_event=None):
+        # Run the mate solver for up to mate_time seconds, or until stop_event is set; the minimax evaluation has
+        # no notion of mate, so forced mates beyond the search depth are only found here. Returns (and keeps)
+        # the mating line or None
+        self.mating_line = None
+        if board.current_turn == ai_color and mate_time > 0:
+            self.mating_line = self.mate_solver.solve(board, MATE_SEARCH_MOVES, mate_time, stop_event)
+            if self.mating_line:
+                self.nodes = self.mate_solver.nodes
+        return self.mating_line
+
+    def search_root(self, board: BoardState, ai_color: PieceColor, depth: int, first_move=None):
+        lines = self.search_lines(board, ai_color, depth, 1, [first_move] if first_move else None)
+        return (lines[0][0], lines[0][1]) if lines else (None, -math.inf)
 
-        if is_maximizing_player: # AI's turn
-            max_eval = -math.inf
-            for piece in board.pieces:
-                if piece.color == board.current_turn:
-                    for move in board.calculate_possible_moves(piece):
-                        new_board = board.apply_move(piece, move[0], move[1])
-                        eval = self.minimax(new_board, depth - 1, alpha, beta, ai_color, False)
-                        max_eval = max(max_eval, eval)
-                        alpha = max(alpha, eval)
-                        if beta <= alpha:
-                            break
-                if beta <= alpha: # Check outer loop as well
+    def search_lines(self, board: BoardState, ai_color: PieceColor, depth: int, count: int, first_moves=None):
+        # The best count root moves as [(move, score)], best first. One pass over the root moves: a move only
+        # needs an exact score when it beats the current count-th best line, so that score is the root alpha
+        # The AI always maximizes its own evaluation at the root, whichever color it plays
+        root_moves = [(piece, move) for _, piece, move in self.ordered_moves(board, ai_color)]
+        if first_moves: # Search the previous iteration's best moves first
+            first_moves = [move for move in first_moves if move in root_moves]
+            root_moves = first_moves + [move for move in root_moves if move not in first_moves]
+
+        # Any position already seen in the game or on the current path is scored as a draw
+        self.path_hashes = set(board.previous_hashes)
+        self.path_hashes.add(board.position_hash)
+
+        lines = []
+        for piece, move in root_moves:
+            alpha = lines[-1][1] if len(lines) == count else -math.inf
+            new_board = board.apply_move(piece, move[0], move[1])
+            eval = self.minimax(new_board, depth - 1, alpha, math.inf, ai_color, False)
+            if eval > alpha:
+                lines.append(((piece, move), eval))
+                lines.sort(key=lambda line: line[1], reverse=True) # Stable, so earlier moves win ties
+                del lines[count:]
+        return lines
+
+    def principal_variation(self, board: BoardState, ai_color: PieceColor, first_move, depth: int):
+        # first_move followed by the best moves stored in the transposition table, up to depth plies
+        piece, move = first_move
+        pv = [first_move]
+        board = board.apply_move(piece, move[0], move[1])
+        seen = {board.position_hash}
+        while len(pv) < depth:
+            entry = self.transposition_table.get((board.position_hash, ai_color))
+            if entry is None or entry[3] == NULL_MOVE:
+                break
+            piece, move = decode_move(board, entry[3])
+            if piece.color != board.current_turn or move not in board.calculate_possible_moves(piece):
+                break # A hash collision or a stale entry
+            pv.append((piece, move))
+            board = board.apply_move(piece, move[0], move[1])
+            if board.position_hash in seen:
+                break
+            seen.add(board.position_hash)
+        return pv
+
+    def analyze(self, board: BoardState, ai_color: PieceColor, lines: int = MULTI_PV_LINES, max_depth: int = None,
+                time_limit: float = None, stop_event=None, on_iteration=None):
+        # Multi-PV search: the best lines root moves as [(move, score, pv)] from the deepest completed iteration,
+        # where pv is a list of (piece, (row, col)) starting with move. All lines share one search and its
+        # transposition table, so lines after the first cost little more than a single best-move search
+        results, completed_depth = self._iterate(board, ai_color, lines, max_depth, time_limit, stop_event, on_iteration)
+        return [(move, score, self.principal_variation(board, ai_color, move, completed_depth))
+                for move, score in results], completed_depth
+
+    def search(self, board: BoardState, ai_color: PieceColor, max_depth: int = None, time_limit: float = None,
+               stop_event=None, on_iteration=None):
+        # Iterative deepening until max_depth, time_limit (seconds) or stop_event; returns (best_move, score, depth).
+        # A timed search first gives the mate solver a slice of its time; a search limited by depth alone does not,
+        # since it has no budget to take the slice from
+        start = time.perf_counter()
+        mate_time = min(self.mate_time, time_limit / 4) if time_limit is not None else 0
+        if self.find_mate(board, ai_color, mate_time, stop_event):
+            line = self.mating_line
+            if on_iteration:
+                on_iteration(len(line), MATE_SCORE - len(line), self.nodes, line[0])
+            return line[0], MATE_SCORE - len(line), len(line)
+        if time_limit is not None:
+            time_limit -= time.perf_counter() - start
+        lines, completed_depth = self._iterate(board, ai_color, 1, max_depth, time_limit, stop_event, on_iteration)
+        best_move, best_eval = lines[0] if lines else (None, None)
+        if best_move is None: # Aborted before depth 1 finished; any legal move beats none
+            legal_moves = board.legal_moves()
+            best_move = legal_moves[0] if legal_moves else None
+        return best_move, best_eval, completed_depth
+
+    def _iterate(self, board: BoardState, ai_color: PieceColor, count: int, max_depth: int, time_limit: float,
+                 stop_event, on_iteration):
+        # Iterative deepening over search_lines; returns the lines and depth of the last completed iteration
+        self.nodes = 0
+        self.deadline = time.perf_counter() + time_limit if time_limit is not None else None
+        self.stop_event = stop_event
+        max_depth = max_depth if max_depth is not None else self.depth
+
+        lines, completed_depth = [], 0
+        try:
+            for depth in range(1, max_depth + 1):
+                new_lines = self.search_lines(board, ai_color, depth, count, [move for move, _ in lines])
+                if not new_lines: # No legal moves
+                    break
+                lines, completed_depth = new_lines, depth
+                if on_iteration:
+                    on_iteration(depth, lines[0][1], self.nodes, lines[0][0])
+        except SearchAborted:
+            pass
+        finally:
+            self.deadline = None
+            self.stop_event = None
+        return lines, completed_depth
+
+    def _check_stop(self):
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            raise SearchAborted()
+        if self.stop_event is not None and self.stop_event.is_set():
+            raise SearchAborted()
+
+    def ordered_moves(self, board: BoardState, color: PieceColor):
+        # Legal moves as (see, piece, move): winning and even captures by static exchange value, then quiet
+        # moves (see is None), then losing captures
+        occupied = board.square_map()
+        captures = []
+        quiet_moves = []
+        for piece in board.pieces:
+            if piece.color == color:
+                for move in board.calculate_possible_moves(piece):
+                    if board.is_capture(piece, move[0], move[1]):
+                        captures.append((board.static_exchange(piece, move[0], move[1], self.PIECE_VALUES, occupied), piece, move))
+                    else:
+                        quiet_moves.append((None, piece, move))
+        captures.sort(key=lambda capture: capture[0], reverse=True)
+        losing = next((i for i, capture in enumerate(captures) if capture[0] < 0), len(captures))
+        return captures[:losing] + quiet_moves + captures[losing:]
+
+    def staged_moves(self, board: BoardState, color: PieceColor, hash_move: int = NULL_MOVE):
+        # Legal moves for the search as (see, piece, move), like ordered_moves but generated in stages: the hash
+        # move, winning and even captures, quiet moves, then losing captures. A stage is only generated when the
+        # search asks for more moves than the earlier stages held, and each move is legality-checked only as it
+        # is yielded, so a node that cuts off early never pays for a full move generation
+        hashed_piece = hashed_target = None
+        if hash_move != NULL_MOVE:
+            piece = board.get_piece_at(*move_from(hash_move))
+            target = move_to(hash_move)
+            if (piece is not None and piece.color == color and target in board.calculate_pseudo_legal_moves(piece)
+                    and board.is_legal_move(piece, target[0], target[1])):
+                hashed_piece, hashed_target = piece, target
+                yield None, piece, target
+
+        # Captures are found from their targets, without generating any quiet moves
+        occupied = board.square_map()
+        captures = []
+        for target in board.pieces:
+            if target.color != color and target.type != PieceType.KING:
+                for attacker in board.attackers_of(target.row, target.col, color, occupied):
+                    captures.append((board.static_exchange(attacker, target.row, target.col, self.PIECE_VALUES, occupied),
+                                     attacker, (target.row, target.col)))
+        if board.en_passant_target_square:
+            row, col = board.en_passant_target_square
+            for attacker in board.attackers_of(row, col, color, occupied):
+                if attacker.type == PieceType.PAWN:
+                    captures.append((board.static_exchange(attacker, row, col, self.PIECE_VALUES, occupied), attacker, (row, col)))
+        captures.sort(key=lambda capture: capture[0], reverse=True)
+        losing = next((i for i, capture in enumerate(captures) if capture[0] < 0), len(captures))
+
+        for see, piece, move in captures[:losing]:
+            if (piece is not hashed_piece or move != hashed_target) and board.is_legal_move(piece, move[0], move[1]):
+                yield see, piece, move
+
+        for piece in board.pieces:
+            if piece.color == color:
+                for move in board.calculate_pseudo_legal_moves(piece):
+                    if board.is_capture(piece, move[0], move[1]) or (piece is hashed_piece and move == hashed_target):
+                        continue
+                    if board.is_legal_move(piece, move[0], move[1]):
+                        yield None, piece, move
+
+        for see, piece, move in captures[losing:]:
+            if (piece is not hashed_piece or move != hashed_target) and board.is_legal_move(piece, move[0], move[1]):
+                yield see, piece, move
+
+    def good_captures(self, board: BoardState, color: PieceColor):
+        # Pseudo-legal captures of enemy pieces that do not lose material (SEE >= 0), best first;
+        # losing captures are dropped before any move generation or legality check is spent on them
+        occupied = board.square_map()
+        captures = []
+        for target in board.pieces:
+            if target.color != color and target.type != PieceType.KING:
+                for attacker in board.attackers_of(target.row, target.col, color, occupied):
+                    see = board.static_exchange(attacker, target.row, target.col, self.PIECE_VALUES, occupied)
+                    if see >= 0:
+                        captures.append((see, attacker, (target.row, target.col)))
+        captures.sort(key=lambda capture: capture[0], reverse=True)
+        return captures
+
+    def quiescence(self, board: BoardState, depth: int, alpha: int, beta: int, ai_color: PieceColor, is_maximizing_player: bool) -> int:
+        # Search captures only until the position is quiet, so the evaluation is not taken in the middle of an exchange
+        self.nodes += 1
+        self._check_stop()
+        stand_pat = self.evaluate_board(board, ai_color)
+        if depth == 0:
+            return stand_pat
+
+        if is_maximizing_player:
+            if stand_pat >= beta:
+                return stand_pat
+            max_eval = stand_pat
+            alpha = max(alpha, stand_pat)
+            for _, piece, move in self.good_captures(board, board.current_turn):
+                if not board.is_legal_move(piece, move[0], move[1]):
+                    continue
+                new_board = board.apply_move(piece, move[0], move[1])
+                eval = self.quiescence(new_board, depth - 1, alpha, beta, ai_color, False)
+                max_eval = max(max_eval, eval)
+                alpha = max(alpha, eval)
+                if beta <= alpha:
                     break
             return max_eval
-        else: # Opponent's turn
-            min_eval = math.inf
-            for piece in board.pieces:
-                if piece.color == board.current_turn:
-                    for move in board.calculate_possible_moves(piece):
-                        new_board = board.apply_move(piece, move[0], move[1])
-                        eval = self.minimax(new_board, depth - 1, alpha, beta, ai_color, True)
-                        min_eval = min(min_eval, eval)
-                        beta = min(beta, eval)
-                        if beta <= alpha:
-                            break
-                if beta <= alpha: # Check outer loop as well
+        else:
+            if stand_pat <= alpha:
+                return stand_pat
+            min_eval = stand_pat
+            beta = min(beta, stand_pat)
+            for _, piece, move in self.good_captures(board, board.current_turn):
+                if not board.is_legal_move(piece, move[0], move[1]):
+                    continue
+                new_board = board.apply_move(piece, move[0], move[1])
+                eval = self.quiescence(new_board, depth - 1, alpha, beta, ai_color, True)
+                min_eval = min(min_eval, eval)
+                beta = min(beta, eval)
+                if beta <= alpha:
                     break
             return min_eval
+
+    def minimax(self, board: BoardState, depth: int, alpha: int, beta: int, ai_color: PieceColor, is_maximizing_player: bool) -> int:
+        self.nodes += 1
+        self._check_stop()
+        position_hash = board.position_hash
+        if position_hash in self.path_hashes or board.is_fifty_move_draw():
+            self.history_draws += 1
+            return 0 # Repetition or fifty-move draw; the subtree does not need searching
+        if depth == 0:
+            return self.quiescence(board, QUIESCENCE_DEPTH, alpha, beta, ai_color, is_maximizing_player)
+
+        key = (position_hash, ai_color)
+        entry = self.transposition_table.get(key)
+        hash_move = NULL_MOVE # The best move of an earlier search of this position goes first
+        if entry is not None:
+            entry_depth, score, bound, hash_move = entry
+            if entry_depth >= depth and (bound == EXACT or (bound == LOWER_BOUND and score >= beta)
+                                         or (bound == UPPER_BOUND and score <= alpha)):
+                return score
+
+        moves = self.staged_moves(board, board.current_turn, hash_move)
+        original_alpha, original_beta = alpha, beta
+        history_draws = self.history_draws
+        best_move = None
+        self.path_hashes.add(position_hash)
+        try:
+            if is_maximizing_player: # AI's turn
+                best_eval = -math.inf
+                for see, piece, move in moves:
+                    # Near the leaves, losing captures are not worth a subtree once another move has been searched
+                    if see is not None and see < 0 and depth <= SEE_PRUNE_DEPTH and best_eval > -math.inf:
+                        break
+                    new_board = board.apply_move(piece, move[0], move[1])
+                    eval = self.minimax(new_board, depth - 1, alpha, beta, ai_color, False)
+                    if eval > best_eval:
+                        best_eval, best_move = eval, (piece, move)
+                    alpha = max(alpha, eval)
+                    if beta <= alpha:
+                        break
+            else: # Opponent's turn
+                best_eval = math.inf
+                for see, piece, move in moves:
+                    if see is not None and see < 0 and depth <= SEE_PRUNE_DEPTH and best_eval < math.inf:
+                        break
+                    new_board = board.apply_move(piece, move[0], move[1])
+                    eval = self.minimax(new_board, depth - 1, alpha, beta, ai_color, True)
+                    if eval < best_eval:
+                        best_eval, best_move = eval, (piece, move)
+                    beta = min(beta, eval)
+                    if beta <= alpha:
+                        break
+        finally:
+            self.path_hashes.discard(position_hash)
+
+        if best_move is None: # Checkmate or stalemate; no legal move was generated
+            return self.evaluate_board(board, ai_color)
+        if best_eval <= original_alpha:
+            bound = UPPER_BOUND
+        elif best_eval >= original_beta:
+            bound = LOWER_BOUND
+        else:
+            bound = EXACT
+        # When every move failed low for the side to move, none of them is known to be the best
+        failed_low = bound == (UPPER_BOUND if is_maximizing_player else LOWER_BOUND)
+        packed = encode_move(board, best_move[0], best_move[1]) if best_move and not failed_low else NULL_MOVE
+        # The table outlives the search, and the game history behind it. A score that a repetition or fifty-move
+        # draw in the subtree helped decide is stored at depth 0: probes (depth 1 and up) never trust it,
+        # but its move still orders the next search of this position
+        stored_depth = depth if self.history_draws == history_draws else 0
+        self.transposition_table.put(key, (stored_depth, best_eval, bound, packed))
+        return best_eval
@@ -0,0 +1,217 @@
+import numpy as np
+from chess_logic import BoardState, PieceColor, PieceType
+from chess_ai import ChessAI
+
+# Positions can be packed three ways, all indexed by square = row * 8 + col:
+#   codes      (N, 64) int8, 0 for an empty square, 1-6 white and 7-12 black pieces (PieceType.value + 6 for black)
+#   planes     (N, 12, 8, 8) bool, one plane per code (plane index = code - 1)
+#   bitboards  (N, 12) uint64, one bitboard per code (bit index = square)
+# evaluate_batch accepts any of them; bitboards are what the evaluation itself runs on.
+NUM_PIECE_CODES = 12
+
+def piece_code(type: PieceType, color: PieceColor) -> int:
+    return type.value + (6 if color == PieceColor.BLACK else 0)
+
+def pack_board(board: BoardState, out=None) -> np.ndarray:
+    codes = np.zeros(64, dtype=np.int8) if out is None else out
+    # Iterate in reverse so the first piece on a square wins, like BoardState.get_piece_at
+    for piece in reversed(board.pieces):
+        codes[piece.row * 8 + piece.col] = piece_code(piece.type, piece.color)
+    return codes
+
+def pack_boards(boards) -> np.ndarray:
+    boards = list(boards)
+    codes = np.zeros((len(boards), 64), dtype=np.int8)
+    for i, board in enumerate(boards):
+        pack_board(board, codes[i])
+    return codes
+
+def to_planes(codes: np.ndarray) -> np.ndarray:
+    codes = np.asarray(codes)
+    planes = codes[:, None, :] == np.arange(1, NUM_PIECE_CODES + 1, dtype=codes.dtype)[None, :, None]
+    return planes.reshape(len(codes), NUM_PIECE_CODES, 8, 8)
+
+def to_bitboards(positions: np.ndarray) -> np.ndarray:
+    positions = np.asarray(positions)
+    if positions.dtype == np.uint64 and positions.shape[1:] == (NUM_PIECE_CODES,):
+        return positions
+    if positions.ndim == 4: # planes
+        planes = positions.reshape(len(positions), NUM_PIECE_CODES, 64).astype(bool, copy=False)
+    else: # codes
+        planes = to_planes(positions).reshape(len(positions), NUM_PIECE_CODES, 64)
+    packed = np.packbits(planes, axis=2, bitorder='little')
+    return np.ascontiguousarray(packed).view('<u8').reshape(len(positions), NUM_PIECE_CODES).astype(np.uint64, copy=False)
+
+def _bit(row: int, col: int) -> int:
+    return 1 << (row * 8 + col)
+
+def _mask(squares) -> int:
+    mask = 0
+    for row, col in squares:
+        mask |= _bit(row, col)
+    return mask
+
+def _offset_table(offsets) -> np.ndarray:
+    table = np.zeros(64, dtype=np.uint64)
+    for sq in range(64):
+        row, col = divmod(sq, 8)
+        table[sq] = _mask((row + dr, col + dc) for dr, dc in offsets if 0 <= row + dr <= 7 and 0 <= col + dc <= 7)
+    return table
+
+def _ray_table(dr: int, dc: int) -> np.ndarray:
+    table = np.zeros(64, dtype=np.uint64)
+    for sq in range(64):
+        row, col = divmod(sq, 8)
+        squares = []
+        r, c = row + dr, col + dc
+        while 0 <= r <= 7 and 0 <= c <= 7:
+            squares.append((r, c))
+            r, c = r + dr, c + dc
+        table[sq] = _mask(squares)
+    return table
+
+def _value_masks(values: dict):
+    # Group a {(row, col): value} table into [(value, bitboard)] so it can be summed with popcounts
+    masks = {}
+    for (row, col), value in values.items():
+        if value:
+            masks[value] = masks.get(value, 0) | _bit(row, col)
+    return [(value, np.uint64(mask)) for value, mask in masks.items()]
+
+KNIGHT_ATTACKS = _offset_table([(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)])
+KING_ATTACKS = _offset_table([(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)])
+# Squares a pawn of the given color would have to stand on to attack a square (see BoardState.is_square_attacked)
+PAWN_ATTACKERS = {
+    PieceColor.WHITE: _offset_table([(1, -1), (1, 1)]),
+    PieceColor.BLACK: _offset_table([(-1, -1), (-1, 1)]),
+}
+# (ray table, runs towards higher squares) for each slider direction
+STRAIGHT_RAYS = [(_ray_table(dr, dc), dr * 8 + dc > 0) for dr, dc in [(-1, 0), (1, 0), (0, -1), (0, 1)]]
+DIAGONAL_RAYS = [(_ray_table(dr, dc), dr * 8 + dc > 0) for dr, dc in [(-1, -1), (-1, 1), (1, -1), (1, 1)]]
+
+CENTER = np.uint64(_mask([(3, 3), (3, 4), (4, 3), (4, 4)]))
+ROW_1 = np.uint64(_mask((1, c) for c in range(8)))
+ROW_6 = np.uint64(_mask((6, c) for c in range(8)))
+FILE_A = np.uint64(_mask((r, 0) for r in range(8)))
+
+KNIGHT_TABLE = _value_masks(ChessAI.KNIGHT_POSITIONS)
+# Squares whose row has the given bit set, so the sum of rows of a bitboard takes three popcounts
+ROW_BITS = [(1 << b, np.uint64(_mask((r, c) for r in range(8) for c in range(8) if r & (1 << b)))) for b in range(3)]
+
+MATERIAL = np.zeros(NUM_PIECE_CODES, dtype=np.int64) # Signed from White's point of view
+for _type, _value in ChessAI.PIECE_VALUES.items():
+    MATERIAL[piece_code(_type, PieceColor.WHITE) - 1] = _value
+    MATERIAL[piece_code(_type, PieceColor.BLACK) - 1] = -_value
+
+if hasattr(np, 'bitwise_count'): # NumPy 2.0+
+    def popcount(x: np.ndarray) -> np.ndarray:
+        return np.bitwise_count(x).astype(np.int64)
+else:
+    def popcount(x: np.ndarray) -> np.ndarray:
+        x = x - ((x >> np.uint64(1)) & np.uint64(0x5555555555555555))
+        x = (x & np.uint64(0x3333333333333333)) + ((x >> np.uint64(2)) & np.uint64(0x3333333333333333))
+        x = (x + (x >> np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+        return ((x * np.uint64(0x0101010101010101)) >> np.uint64(56)).astype(np.int64)
+
+def _lowest_bit(x: np.ndarray) -> np.ndarray:
+    return x & (~x + np.uint64(1))
+
+def _highest_bit(x: np.ndarray) -> np.ndarray:
+    for shift in (1, 2, 4, 8, 16, 32):
+        x = x | (x >> np.uint64(shift))
+    return x ^ (x >> np.uint64(1))
+
+def _square_of(bit: np.ndarray) -> np.ndarray:
+    # Index of a single set bit; powers of two are exact in float64
+    return np.log2(np.where(bit == 0, np.uint64(1), bit).astype(np.float64)).astype(np.intp)
+
+def _table_sum(bb: np.ndarray, table) -> np.ndarray:
+    total = np.zeros(len(bb), dtype=np.int64)
+    for value, mask in table:
+        total += popcount(bb & mask) * value
+    return total
+
+def _row_sum(bb: np.ndarray) -> np.ndarray:
+    return _table_sum(bb, ROW_BITS)
+
+def _file_fill(bb: np.ndarray) -> np.ndarray:
+    # Set every square on each file that has at least one bit set
+    for shift in (8, 16, 32):
+        bb = bb | (bb >> np.uint64(shift))
+    files = bb & np.uint64(0xFF)
+    return files * np.uint64(0x0101010101010101)
+
+def _isolated_pawns(pawns: np.ndarray) -> np.ndarray:
+    files = _file_fill(pawns)
+    not_a = ~FILE_A
+    not_h = ~(FILE_A << np.uint64(7))
+    neighbours = ((files << np.uint64(1)) & not_a) | ((files >> np.uint64(1)) & not_h)
+    return popcount(pawns & ~neighbours)
+
+def _rook_terms(rooks: np.ndarray, own_pawns: np.ndarray, seventh_row: np.uint64) -> np.ndarray:
+    return popcount(rooks & ~_file_fill(own_pawns)) * 30 + popcount(rooks & seventh_row) * 40
+
+def _slider_hits(king_sq: np.ndarray, occupied: np.ndarray, attackers: np.ndarray, rays) -> np.ndarray:
+    hit = np.zeros(len(king_sq), dtype=bool)
+    for table, ascending in rays:
+        blockers = occupied & table[king_sq]
+        first = _lowest_bit(blockers) if ascending else _highest_bit(blockers)
+        hit |= (first & attackers) != 0
+    return hit
+
+def _king_attacked(bbs: np.ndarray, player_color: PieceColor) -> np.ndarray:
+    enemy_color = PieceColor.BLACK if player_color == PieceColor.WHITE else PieceColor.WHITE
+
+    def enemy(type):
+        return bbs[:, piece_code(type, enemy_color) - 1]
+
+    king = bbs[:, piece_code(PieceType.KING, player_color) - 1]
+    king_sq = _square_of(_lowest_bit(king))
+    occupied = np.bitwise_or.reduce(bbs, axis=1)
+    queens = enemy(PieceType.QUEEN)
+
+    attacked = (PAWN_ATTACKERS[enemy_color][king_sq] & enemy(PieceType.PAWN)) != 0
+    attacked |= (KNIGHT_ATTACKS[king_sq] & enemy(PieceType.KNIGHT)) != 0
+    attacked |= (KING_ATTACKS[king_sq] & enemy(PieceType.KING)) != 0
+    attacked |= _slider_hits(king_sq, occupied, enemy(PieceType.ROOK) | queens, STRAIGHT_RAYS)
+    attacked |= _slider_hits(king_sq, occupied, enemy(PieceType.BISHOP) | queens, DIAGONAL_RAYS)
+    return (king != 0) & attacked
+
+def evaluate_batch(positions: np.ndarray, player_color: PieceColor) -> np.ndarray:
+    # Vectorized ChessAI.evaluate_board; returns an (N,) int64 array of scores for player_color
+    bbs = to_bitboards(positions)
+
+    def bb(type, color):
+        return bbs[:, piece_code(type, color) - 1]
+
+    white_occupied = np.bitwise_or.reduce(bbs[:, :6], axis=1)
+    black_occupied = np.bitwise_or.reduce(bbs[:, 6:], axis=1)
+    white_pawns = bb(PieceType.PAWN, PieceColor.WHITE)
+    black_pawns = bb(PieceType.PAWN, PieceColor.BLACK)
+
+    # Terms that are symmetric between the sides, computed from White's point of view
+    white_pov = popcount(bbs) @ MATERIAL
+    white_pov += (popcount(white_occupied & CENTER) - popcount(black_occupied & CENTER)) * 10
+    # Pawn advancement: (row - 1) * 5 for white pawns, (6 - row) * 5 for black pawns
+    white_pov += (_row_sum(white_pawns) - popcount(white_pawns)) * 5
+    white_pov -= (popcount(black_pawns) * 6 - _row_sum(black_pawns)) * 5
+    white_pov += (_isolated_pawns(black_pawns) - _isolated_pawns(white_pawns)) * 20
+    white_pov += _table_sum(bb(PieceType.KNIGHT, PieceColor.WHITE), KNIGHT_TABLE)
+    white_pov -= _table_sum(bb(PieceType.KNIGHT, PieceColor.BLACK), KNIGHT_TABLE)
+    white_pov += _rook_terms(bb(PieceType.ROOK, PieceColor.WHITE), white_pawns, ROW_6)
+    white_pov -= _rook_terms(bb(PieceType.ROOK, PieceColor.BLACK), black_pawns, ROW_1)
+
+    score = white_pov if player_color == PieceColor.WHITE else -white_pov
+
+    # Bishop pair: our own pair takes precedence over the opponent's, as in evaluate_board
+    enemy_color = PieceColor.BLACK if player_color == PieceColor.WHITE else PieceColor.WHITE
+    own_pair = popcount(bb(PieceType.BISHOP, player_color)) >= 2
+    enemy_pair = popcount(bb(PieceType.BISHOP, enemy_color)) >= 2
+    score += own_pair * 50
+    score -= (enemy_pair & ~own_pair) * 50
+
+    score -= _king_attacked(bbs, player_color) * 50
+    return score
+
+def evaluate_boards(boards, player_color: PieceColor) -> np.ndarray:
+    return evaluate_batch(pack_boards(boards), player_color)
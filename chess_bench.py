@@ -0,0 +1,242 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from chess_logic import BoardState, PieceColor, PieceType, ChessPiece
+from chess_ai import ChessAI
+from chess_mate import MateSolver
+from chess_pgn import parse_san
+
+# Performance regression benchmarks for the engine and the board renderer.
+#   python chess_bench.py                     run, write bench_results.json, compare with bench_baseline.json
+#   python chess_bench.py --save-baseline     run and store the results as the new baseline
+# Every benchmark is timed REPEAT times and the fastest run is kept, which filters out most scheduler noise.
+# The exit status is 1 when any benchmark is slower than the baseline by more than the threshold, or when a search
+# visits a different number of nodes than in the baseline: the search changed, and the baseline has to be re-saved.
+BASELINE_FILE = "bench_baseline.json"
+RESULTS_FILE = "bench_results.json"
+REPEAT = 3
+THRESHOLD = 0.15 # Allowed slowdown as a fraction of the baseline ops/s
+SEARCH_DEPTHS = (2, 3)
+RENDER_FRAMES = 50
+MATE_NODES = 3000 # Node budget of the mate solver benchmark; it finds the mate, then spends the rest on shorter ones
+
+# Fixed positions as SAN from the starting position, so the set never drifts with engine changes
+OPENINGS = {
+    "start": "",
+    "italian": "e4 e5 Nf3 Nc6 Bc4 Bc5 c3 Nf6 d4 exd4 cxd4 Bb4+ Nc3 Nxe4 O-O",
+    "queens_gambit": "d4 d5 c4 e6 Nc3 Nf6 Bg5 Be7 e3 O-O Nf3 Nbd7 Rc1 c6 Bd3 dxc4 Bxc4 Nd5",
+}
+
+def endgame_position() -> BoardState:
+    # Rook and pawns endgame, white to move
+    pieces = [
+        ChessPiece(PieceType.KING, PieceColor.WHITE, 6, 6, True),
+        ChessPiece(PieceType.ROOK, PieceColor.WHITE, 7, 3, True),
+        ChessPiece(PieceType.PAWN, PieceColor.WHITE, 6, 5, False),
+        ChessPiece(PieceType.PAWN, PieceColor.WHITE, 5, 6, True),
+        ChessPiece(PieceType.PAWN, PieceColor.WHITE, 4, 0, True),
+        ChessPiece(PieceType.KING, PieceColor.BLACK, 1, 5, True),
+        ChessPiece(PieceType.ROOK, PieceColor.BLACK, 2, 2, True),
+        ChessPiece(PieceType.PAWN, PieceColor.BLACK, 1, 6, False),
+        ChessPiece(PieceType.PAWN, PieceColor.BLACK, 2, 7, True),
+        ChessPiece(PieceType.PAWN, PieceColor.BLACK, 3, 1, True),
+    ]
+    return BoardState(pieces, PieceColor.WHITE)
+
+def benchmark_positions():
+    positions = {}
+    for name, movetext in OPENINGS.items():
+        board = BoardState()
+        for san in movetext.split():
+            piece, target = parse_san(board, san)
+            board = board.apply_move(piece, target[0], target[1])
+        positions[name] = board
+    positions["endgame"] = endgame_position()
+    return positions
+
+def fastest(run, repeat: int):
+    # run() does one timed pass and returns (ops, extra fields); keep the fastest of repeat passes
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        ops, extra = run()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best[0]:
+            best = (elapsed, ops, extra)
+    elapsed, ops, extra = best
+    return {"ops": ops, "seconds": round(elapsed, 6), "ops_per_sec": round(ops / elapsed, 3), **extra}
+
+def bench_move_generation(boards):
+    def run():
+        calls = 0
+        for board in boards:
+            for piece in board.pieces:
+                if piece.color == board.current_turn:
+                    board.calculate_possible_moves(piece)
+                    calls += 1
+        return calls, {}
+    return run
+
+def bench_apply_move(boards):
+    moves = [(board, board.legal_moves()) for board in boards]
+    def run():
+        calls = 0
+        for board, legal in moves:
+            for piece, (row, col) in legal:
+                board.apply_move(piece, row, col)
+                calls += 1
+        return calls, {}
+    return run
+
+def bench_square_attacked(boards):
+    def run():
+        calls = 0
+        for board in boards:
+            for color in (PieceColor.WHITE, PieceColor.BLACK):
+                for row in range(8):
+                    for col in range(8):
+                        board.is_square_attacked(row, col, color)
+                calls += 128
+        return calls, {}
+    return run
+
+def bench_evaluate(boards):
+    # Children of the fixed positions, evaluated with cold caches so the evaluator itself is timed
+    children = [board.apply_move(piece, row, col) for board in boards for piece, (row, col) in board.legal_moves()]
+    def run():
+        ai = ChessAI()
+        for board in children:
+            ai.evaluate_board(board, PieceColor.WHITE)
+        return len(children), {}
+    return run
+
+def mate_position() -> BoardState:
+    # Smothered mate in four, white to move: Nf7+ Kg8 Nh6+ Kh8 Qg8+ Rxg8 Nf7#
+    pieces = [
+        ChessPiece(PieceType.KING, PieceColor.WHITE, 7, 6, True),
+        ChessPiece(PieceType.PAWN, PieceColor.WHITE, 6, 6, False),
+        ChessPiece(PieceType.PAWN, PieceColor.WHITE, 6, 7, False),
+        ChessPiece(PieceType.QUEEN, PieceColor.WHITE, 4, 2, True),
+        ChessPiece(PieceType.KNIGHT, PieceColor.WHITE, 3, 6, True),
+        ChessPiece(PieceType.KING, PieceColor.BLACK, 0, 7, True),
+        ChessPiece(PieceType.ROOK, PieceColor.BLACK, 0, 4, True),
+        ChessPiece(PieceType.PAWN, PieceColor.BLACK, 1, 6, False),
+        ChessPiece(PieceType.PAWN, PieceColor.BLACK, 1, 7, False),
+        ChessPiece(PieceType.PAWN, PieceColor.BLACK, 1, 1, False),
+        ChessPiece(PieceType.PAWN, PieceColor.BLACK, 1, 0, False),
+    ]
+    return BoardState(pieces, PieceColor.WHITE)
+
+def bench_mate(board: BoardState, moves: int):
+    def run():
+        solver = MateSolver(max_nodes=MATE_NODES)
+        solver.solve(board, moves)
+        return 1, {"nodes": solver.nodes}
+    return run
+
+def bench_search(board: BoardState, depth: int):
+    # One op per search, so a change that searches more nodes shows up as a slowdown even at the same nodes/s
+    def run():
+        ai = ChessAI(depth=depth) # Fresh caches every run, so node counts are reproducible
+        ai.find_best_move(board, board.current_turn) # No mate search; the mate solver has its own benchmark
+        return 1, {"nodes": ai.nodes}
+    return run
+
+def bench_render(board: BoardState):
+    # Imported here: main.py sets up a pygame display at import time, which needs the dummy driver when headless
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import main
+    surface = main.pygame.Surface((main.SCREEN_WIDTH, main.SCREEN_HEIGHT))
+    def run():
+        for _ in range(RENDER_FRAMES):
+            main.draw_board(surface)
+            main.draw_pieces(surface, board, None)
+        return RENDER_FRAMES, {}
+    return run
+
+def run_benchmarks(repeat: int = REPEAT, depths=SEARCH_DEPTHS, render: bool = True, report=print):
+    positions = benchmark_positions()
+    boards = list(positions.values())
+    suite = [
+        ("calculate_possible_moves", bench_move_generation(boards)),
+        ("apply_move", bench_apply_move(boards)),
+        ("is_square_attacked", bench_square_attacked(boards)),
+        ("evaluate_board", bench_evaluate(boards)),
+    ]
+    for depth in depths:
+        for name, board in positions.items():
+            suite.append((f"find_best_move/{name}/depth{depth}", bench_search(board, depth)))
+    suite.append(("mate_solver/smothered_mate4", bench_mate(mate_position(), 4)))
+    if render:
+        suite.append(("render/draw_board+draw_pieces", bench_render(positions["start"])))
+
+    results = {}
+    for name, run in suite:
+        results[name] = fastest(run, repeat)
+        result = results[name]
+        nodes = f", {result['nodes']} nodes" if "nodes" in result else ""
+        report(f"{name:45s} {result['ops_per_sec']:>12.2f} ops/s  ({result['seconds'] * 1000:.1f} ms{nodes})")
+    return results
+
+def compare(results: dict, baseline: dict, threshold: float = THRESHOLD):
+    # Returns the benchmarks that slowed down beyond threshold as (name, baseline ops/s, current ops/s, slowdown)
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        slowdown = 1 - result["ops_per_sec"] / base["ops_per_sec"]
+        if slowdown > threshold:
+            regressions.append((name, base["ops_per_sec"], result["ops_per_sec"], slowdown))
+    return regressions
+
+def node_changes(results: dict, baseline: dict):
+    # Searches whose node count differs from the baseline as (name, baseline nodes, current nodes)
+    return [(name, baseline[name].get("nodes"), result["nodes"]) for name, result in results.items()
+            if "nodes" in result and name in baseline and baseline[name].get("nodes") != result["nodes"]]
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the engine and renderer and compare with a stored baseline")
+    parser.add_argument("--output", default=RESULTS_FILE, help="where to write the JSON results")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="allowed slowdown, e.g. 0.15 for 15%%")
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--depths", type=int, nargs="+", default=list(SEARCH_DEPTHS))
+    parser.add_argument("--no-render", action="store_true", help="skip the pygame render benchmark")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.repeat, args.depths, not args.no_render)
+    document = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "benchmarks": results,
+    }
+    with open(args.baseline if args.save_baseline else args.output, "w") as f:
+        json.dump(document, f, indent=2)
+    if args.save_baseline:
+        print(f"Baseline saved to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)["benchmarks"]
+    regressions = compare(results, baseline, args.threshold)
+    for name, base, current, slowdown in regressions:
+        print(f"REGRESSION {name}: {current:.1f} ops/s vs baseline {base:.1f} ({slowdown:.0%} slower)")
+    # A different node count means the search itself changed; that has to be looked at and re-baselined
+    changes = node_changes(results, baseline)
+    for name, base, current in changes:
+        print(f"NODES CHANGED {name}: {current} nodes vs baseline {base}")
+    if regressions or changes:
+        sys.exit(1)
+    print(f"No regressions beyond {args.threshold:.0%}")
+
+if __name__ == "__main__":
+    main()
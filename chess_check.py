@@ -0,0 +1,123 @@
+import argparse
+import random
+import sys
+import time
+from chess_logic import BoardState, PieceColor, PieceType, ChessPiece
+from chess_ai import ChessAI
+from chess_encoding import encode_move, decode_move, encode_position, decode_position
+import chess_batch
+
+# Consistency checks for state that is kept in two ways, over positions from random games.
+#   python chess_check.py                       run every check
+#   python chess_check.py --check encoding      run one check (attack_maps, encoding, batch_eval)
+# Each check compares a fast or incremental result with a direct computation and reports every mismatch;
+# the exit status is 1 when any check fails. Run it after touching apply_move, the encodings or chess_batch.
+GAMES = 30
+MAX_PLIES = 150
+RANDOM_BOARDS = 500 # Random piece placements for the batch evaluator, on top of the game positions
+MAX_REPORTED = 5 # Mismatches printed per check
+
+def random_games(games: int, max_plies: int, rng: random.Random):
+    # Yields (board, legal moves) for every position of random games, one game after another
+    for _ in range(games):
+        board = BoardState()
+        for _ in range(max_plies):
+            moves = board.legal_moves()
+            if not moves:
+                break
+            yield board, moves
+            piece, (row, col) = rng.choice(moves)
+            board = board.apply_move(piece, row, col)
+
+def random_board(rng: random.Random) -> BoardState:
+    # Kings plus up to 30 other pieces on random squares; not necessarily reachable, which is the point
+    squares = rng.sample(range(64), rng.randint(2, 32))
+    pieces = [ChessPiece(PieceType.KING, PieceColor.WHITE, *divmod(squares[0], 8), True),
+              ChessPiece(PieceType.KING, PieceColor.BLACK, *divmod(squares[1], 8), True)]
+    for square in squares[2:]:
+        type = rng.choice([PieceType.PAWN, PieceType.KNIGHT, PieceType.BISHOP, PieceType.ROOK, PieceType.QUEEN])
+        pieces.append(ChessPiece(type, rng.choice(list(PieceColor)), *divmod(square, 8), True))
+    return BoardState(pieces, rng.choice(list(PieceColor)))
+
+def check_attack_maps(positions, rng):
+    # The attack maps apply_move carries over incrementally against a full recompute, after every real move
+    # (the maps accumulate along the game) and every simulated move of each position
+    checked, failures = 0, []
+    for board, moves in positions:
+        boards = [("position", board)]
+        boards += [(f"simulated {piece} to {move}", board.apply_move(piece, move[0], move[1], simulate=True))
+                   for piece, move in moves]
+        for label, child in boards:
+            checked += 1
+            if child.attack_maps != child._compute_attack_maps():
+                failures.append(f"{label} at hash {board.position_hash:016x}")
+    return checked, failures
+
+def check_encoding(positions, rng):
+    # Every legal move survives encode_move/decode_move, and every position survives
+    # encode_position/decode_position with its hash, its legal moves and its encoding unchanged
+    checked, failures = 0, []
+    for board, moves in positions:
+        checked += 1
+        for piece, move in moves:
+            packed = encode_move(board, piece, move)
+            decoded_piece, decoded_move = decode_move(board, packed)
+            if decoded_piece is not piece or decoded_move != move:
+                failures.append(f"move {piece} to {move} decoded as {decoded_piece} to {decoded_move}")
+        data = encode_position(board)
+        decoded = decode_position(data)
+        if decoded.position_hash != board.position_hash:
+            failures.append(f"position {board.position_hash:016x} decoded with hash {decoded.position_hash:016x}")
+        elif encode_position(decoded) != data:
+            failures.append(f"position {board.position_hash:016x} encodes differently after decoding")
+        elif sorted((piece.row, piece.col, move) for piece, move in decoded.legal_moves()) != \
+                sorted((piece.row, piece.col, move) for piece, move in moves):
+            failures.append(f"position {board.position_hash:016x} has different legal moves after decoding")
+    return checked, failures
+
+def check_batch_eval(positions, rng):
+    # chess_batch.evaluate_boards against ChessAI.evaluate_board, which it has to match exactly, for game
+    # positions and random placements
+    boards = [board for board, _ in positions] + [random_board(rng) for _ in range(RANDOM_BOARDS)]
+    ai = ChessAI()
+    failures = []
+    for color in PieceColor:
+        batch = chess_batch.evaluate_boards(boards, color)
+        for board, score in zip(boards, batch):
+            expected = ai.evaluate_board(board, color)
+            if score != expected:
+                failures.append(f"{color.name} at hash {board.position_hash:016x}: batch {score}, expected {expected}")
+    return len(boards) * 2, failures
+
+CHECKS = {
+    "attack_maps": check_attack_maps,
+    "encoding": check_encoding,
+    "batch_eval": check_batch_eval,
+}
+
+def run_checks(names, games: int = GAMES, max_plies: int = MAX_PLIES, seed: int = 0, report=print) -> bool:
+    rng = random.Random(seed)
+    positions = list(random_games(games, max_plies, rng))
+    passed = True
+    for name in names:
+        start = time.perf_counter()
+        checked, failures = CHECKS[name](positions, rng)
+        report(f"{name:12s} {checked} checked, {len(failures)} mismatches ({time.perf_counter() - start:.1f}s)")
+        for failure in failures[:MAX_REPORTED]:
+            report(f"  {failure}")
+        passed = passed and not failures
+    return passed
+
+def main():
+    parser = argparse.ArgumentParser(description="Check incremental and packed state against direct computation")
+    parser.add_argument("--check", choices=list(CHECKS), action="append", help="check to run (default: all)")
+    parser.add_argument("--games", type=int, default=GAMES, help="random games to draw positions from")
+    parser.add_argument("--max-plies", type=int, default=MAX_PLIES)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if not run_checks(args.check or list(CHECKS), args.games, args.max_plies, args.seed):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+from array import array
+from chess_logic import BoardState, PieceColor, PieceType, ChessPiece
+
+# Compact move and position encodings.
+#
+# Move: 16 bits, squares numbered row * 8 + col
+#   bits 0-5   from square
+#   bits 6-11  to square
+#   bits 12-15 flags: bit 14 capture, bit 15 promotion; for promotions bits 12-13 hold the piece
+#              (0 knight, 1 bishop, 2 rook, 3 queen), otherwise one of the special move values below
+#
+# Position: POSITION_SIZE bytes
+#   bytes 0-31  piece code per square, two squares per byte (even square in the low nibble);
+#               0 empty, 1-6 white and 7-12 black pieces (PieceType.value, + 6 for black)
+#   byte 32     bit 0 black to move, bits 1-4 castling rights (white O-O, white O-O-O, black O-O, black O-O-O)
+#   byte 33     en passant file + 1, or 0 for none
+#   byte 34     halfmove clock, capped at 255
+#   byte 35     reserved, 0
+# The repetition history (previous_hashes) is not part of the position.
+#
+# parse_fen builds a board from FEN the same way decode_position does from the packed form.
+QUIET = 0
+DOUBLE_PAWN_PUSH = 1 << 12
+KING_CASTLE = 2 << 12
+QUEEN_CASTLE = 3 << 12
+CAPTURE = 4 << 12
+EN_PASSANT = 5 << 12
+PROMOTION = 8 << 12
+FLAG_MASK = 0xF000
+
+PROMOTION_PIECES = [PieceType.KNIGHT, PieceType.BISHOP, PieceType.ROOK, PieceType.QUEEN]
+NULL_MOVE = 0 # a8 to a8, never a legal move
+
+POSITION_SIZE = 36
+BLACK_TO_MOVE = 1
+CASTLING_SHIFT = 1
+
+FILES = "abcdefgh"
+FEN_PIECES = {"p": PieceType.PAWN, "n": PieceType.KNIGHT, "b": PieceType.BISHOP, "r": PieceType.ROOK,
+              "q": PieceType.QUEEN, "k": PieceType.KING}
+FEN_CASTLING = "KQkq" # In castling rights bit order
+
+def encode_move(board: BoardState, piece: ChessPiece, move) -> int:
+    target_row, target_col = move
+    encoded = (piece.row * 8 + piece.col) | ((target_row * 8 + target_col) << 6)
+    is_capture = board.is_occupied_by_enemy(target_row, target_col, piece.color)
+    if piece.type == PieceType.PAWN:
+        if target_row in (0, 7):
+            encoded |= PROMOTION | (PROMOTION_PIECES.index(PieceType.QUEEN) << 12) # apply_move always promotes to a queen
+            if is_capture:
+                encoded |= CAPTURE
+            return encoded
+        if target_col != piece.col and not is_capture:
+            return encoded | EN_PASSANT
+        if abs(target_row - piece.row) == 2:
+            return encoded | DOUBLE_PAWN_PUSH
+    elif piece.type == PieceType.KING and abs(target_col - piece.col) == 2:
+        return encoded | (KING_CASTLE if target_col == 6 else QUEEN_CASTLE)
+    return encoded | (CAPTURE if is_capture else QUIET)
+
+def move_from(move: int):
+    return divmod(move & 0x3F, 8)
+
+def move_to(move: int):
+    return divmod((move >> 6) & 0x3F, 8)
+
+def move_flags(move: int) -> int:
+    return move & FLAG_MASK
+
+def is_capture_move(move: int) -> bool:
+    return bool(move & CAPTURE) or move & FLAG_MASK == EN_PASSANT
+
+def promotion_piece(move: int):
+    return PROMOTION_PIECES[(move >> 12) & 3] if move & PROMOTION else None
+
+def decode_move(board: BoardState, move: int):
+    # (piece, (row, col)) with the piece object of this board, ready for apply_move
+    from_row, from_col = move_from(move)
+    piece = board.get_piece_at(from_row, from_col)
+    if piece is None:
+        raise ValueError(f"No piece on the from square of move {move:#06x}")
+    return piece, move_to(move)
+
+def encode_moves(board: BoardState, moves) -> array:
+    # Moves of one position as a compact array('H'), e.g. a move list for the search
+    return array("H", (encode_move(board, piece, move) for piece, move in moves))
+
+def encode_game(moves, board: BoardState = None) -> array:
+    # A game's (piece, (row, col)) moves, replayed from board (default: the starting position)
+    board = board if board is not None else BoardState()
+    encoded = array("H")
+    for piece, move in moves:
+        piece = board.get_piece_at(piece.row, piece.col)
+        encoded.append(encode_move(board, piece, move))
+        board = board.apply_move(piece, move[0], move[1])
+    return encoded
+
+def decode_game(encoded, board: BoardState = None):
+    # Yields (board before the move, piece, (row, col)) for an encoded game
+    board = board if board is not None else BoardState()
+    for move in encoded:
+        piece, target = decode_move(board, move)
+        yield board, piece, target
+        board = board.apply_move(piece, target[0], target[1])
+
+def castling_rights(board: BoardState) -> int:
+    # Bit per right in the order white O-O, white O-O-O, black O-O, black O-O-O (matches BoardState.compute_hash)
+    rights = 0
+    for i, color in enumerate((PieceColor.WHITE, PieceColor.BLACK)):
+        king = any(p.type == PieceType.KING and p.color == color and not p.has_moved for p in board.pieces)
+        if king:
+            if any(p.type == PieceType.ROOK and p.color == color and not p.has_moved and p.col == 7 for p in board.pieces):
+                rights |= 1 << (i * 2)
+            if any(p.type == PieceType.ROOK and p.color == color and not p.has_moved and p.col == 0 for p in board.pieces):
+                rights |= 1 << (i * 2 + 1)
+    return rights
+
+def encode_position(board: BoardState) -> bytes:
+    data = bytearray(POSITION_SIZE)
+    for piece in reversed(board.pieces): # The first piece on a square wins, like BoardState.get_piece_at
+        square = piece.row * 8 + piece.col
+        code = piece.type.value + (6 if piece.color == PieceColor.BLACK else 0)
+        shift = 4 * (square & 1)
+        data[square >> 1] = (data[square >> 1] & ~(0xF << shift)) | (code << shift)
+    data[32] = (BLACK_TO_MOVE if board.current_turn == PieceColor.BLACK else 0) | (castling_rights(board) << CASTLING_SHIFT)
+    data[33] = board.en_passant_target_square[1] + 1 if board.en_passant_target_square else 0
+    data[34] = min(board.halfmove_clock, 255)
+    return bytes(data)
+
+def _build_board(codes, rights: int, current_turn: PieceColor, en_passant_file, halfmove_clock: int) -> BoardState:
+    # Board from 64 piece codes (index row * 8 + col, 0 for empty) and the castling rights bits of byte 32
+    pieces = []
+    for square, code in enumerate(codes):
+        if not code:
+            continue
+        color = PieceColor.BLACK if code > 6 else PieceColor.WHITE
+        type = PieceType(code - 6 if code > 6 else code)
+        row, col = divmod(square, 8)
+        has_moved = False
+        # Kings and rooks only count as unmoved on their home squares, while they still carry a castling right
+        color_rights = (rights >> (0 if color == PieceColor.WHITE else 2)) & 3
+        home_row = 7 if color == PieceColor.WHITE else 0
+        if type == PieceType.KING:
+            has_moved = color_rights == 0 or (row, col) != (home_row, 4)
+        elif type == PieceType.ROOK:
+            has_moved = not (row == home_row and ((col == 7 and color_rights & 1) or (col == 0 and color_rights & 2)))
+        pieces.append(ChessPiece(type, color, row, col, has_moved))
+    en_passant = None
+    if en_passant_file is not None:
+        en_passant = (2 if current_turn == PieceColor.WHITE else 5, en_passant_file)
+    return BoardState(pieces, current_turn, en_passant, halfmove_clock=halfmove_clock)
+
+def decode_position(data) -> BoardState:
+    # data is any bytes-like object of POSITION_SIZE bytes, e.g. a memoryview slice of a larger buffer
+    if len(data) != POSITION_SIZE:
+        raise ValueError(f"Packed positions are {POSITION_SIZE} bytes, got {len(data)}")
+    codes = [(data[square >> 1] >> (4 * (square & 1))) & 0xF for square in range(64)]
+    for square, code in enumerate(codes):
+        if code > 12:
+            raise ValueError(f"Invalid piece code {code} on square {square}")
+    flags = data[32]
+    current_turn = PieceColor.BLACK if flags & BLACK_TO_MOVE else PieceColor.WHITE
+    return _build_board(codes, flags >> CASTLING_SHIFT, current_turn, data[33] - 1 if data[33] else None, data[34])
+
+def parse_fen(fen: str) -> BoardState:
+    # Board from Forsyth-Edwards Notation. The fullmove number is ignored and may be left out along with the
+    # halfmove clock, as in EPD; like a packed position, a FEN carries no repetition history
+    fields = fen.split()
+    if not 4 <= len(fields) <= 6:
+        raise ValueError(f"FEN needs 4 to 6 fields, got {len(fields)}: {fen!r}")
+    placement, turn, castling, en_passant = fields[:4]
+    ranks = placement.split("/")
+    if len(ranks) != 8:
+        raise ValueError(f"FEN placement needs 8 ranks: {placement!r}")
+    codes = []
+    for rank in ranks: # Rank 8 first, which is row 0
+        row = []
+        for char in rank:
+            if char.isdigit():
+                row += [0] * int(char)
+            elif char.lower() in FEN_PIECES:
+                row.append(FEN_PIECES[char.lower()].value + (0 if char.isupper() else 6))
+            else:
+                raise ValueError(f"Invalid FEN piece {char!r}")
+        if len(row) != 8:
+            raise ValueError(f"FEN rank {rank!r} does not have 8 squares")
+        codes += row
+    if turn not in ("w", "b"):
+        raise ValueError(f"Invalid FEN side to move {turn!r}")
+    current_turn = PieceColor.WHITE if turn == "w" else PieceColor.BLACK
+    if castling != "-" and not set(castling) <= set(FEN_CASTLING):
+        raise ValueError(f"Invalid FEN castling rights {castling!r}")
+    rights = sum(1 << FEN_CASTLING.index(char) for char in set(castling) - {"-"})
+    en_passant_file = None
+    if en_passant != "-":
+        if len(en_passant) != 2 or en_passant[0] not in FILES or en_passant[1] != ("6" if turn == "w" else "3"):
+            raise ValueError(f"Invalid FEN en passant square {en_passant!r}")
+        en_passant_file = FILES.index(en_passant[0])
+    try:
+        halfmove_clock = int(fields[4]) if len(fields) > 4 else 0
+    except ValueError:
+        raise ValueError(f"Invalid FEN halfmove clock {fields[4]!r}") from None
+    return _build_board(codes, rights, current_turn, en_passant_file, halfmove_clock)
+
+def encode_positions(boards) -> bytes:
+    return b"".join(encode_position(board) for board in boards)
+
+def iter_positions(buffer):
+    # Decode a buffer of back-to-back packed positions; slices are memoryviews, so nothing is copied
+    view = memoryview(buffer)
+    for offset in range(0, len(view) - POSITION_SIZE + 1, POSITION_SIZE):
+        yield decode_position(view[offset:offset + POSITION_SIZE])
+
+def position_at(buffer, index: int) -> BoardState:
+    offset = index * POSITION_SIZE
+    return decode_position(memoryview(buffer)[offset:offset + POSITION_SIZE])
@@ -0,0 +1,268 @@
+import argparse
+import heapq
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from chess_logic import BoardState, PieceColor
+from chess_encoding import encode_move, decode_move
+from chess_pgn import PGNGame, read_pgn_file, parse_san, move_to_san
+
+# Opening explorer: move statistics per position over a PGN collection.
+#   python chess_explorer.py index book.idx games.pgn [more.pgn ...]   build an index
+#   python chess_explorer.py query book.idx "e4 e5 Nf3"                moves played after these moves
+#
+# Index file: a header, then fixed-size entries sorted by (position hash, move), one per move played in a position:
+#   header  magic (8 bytes), entry count (uint64), games indexed (uint64)
+#   entry   position hash (uint64), packed move (uint16, chess_encoding), 2 padding bytes,
+#           white wins, draws, black wins (uint32 each)
+# The file is memory-mapped and binary-searched, so a query touches a handful of pages whatever the index size.
+MAGIC = b"CHESSIDX"
+HEADER = struct.Struct("<8sQQ")
+ENTRY = struct.Struct("<QHxxIII")
+HASH = struct.Struct("<Q")
+MAX_PLIES = 40 # Plies indexed per game; an opening explorer does not need the endgame
+CHUNK_GAMES = 200 # Games per worker task
+RUN_ENTRIES = 1 << 20 # Distinct (position, move) pairs held in memory before a sorted run is written to disk
+REPORT_CHUNKS = 50 # Progress is reported every this many chunks
+RESULT_COLUMNS = {"1-0": 0, "1/2-1/2": 1, "0-1": 2}
+
+class MoveStats:
+    def __init__(self, piece, move, packed_move: int, white: int, draws: int, black: int, color: PieceColor):
+        self.piece = piece
+        self.move = move
+        self.packed_move = packed_move
+        self.white = white
+        self.draws = draws
+        self.black = black
+        self.color = color # Side that played the move
+
+    def __repr__(self):
+        return f"MoveStats({self.piece!r}, {self.move}, games={self.games}, score={self.score:.3f})"
+
+    @property
+    def games(self) -> int:
+        return self.white + self.draws + self.black
+
+    @property
+    def score(self) -> float:
+        # Points per game for the side that played the move
+        wins = self.white if self.color == PieceColor.WHITE else self.black
+        return (wins + self.draws / 2) / self.games if self.games else 0.0
+
+def index_games(games, max_plies: int = MAX_PLIES) -> dict:
+    # Counts per (position hash, packed move) for a list of (result, movetext); runs in a worker process
+    counts = {}
+    for result, movetext in games:
+        column = RESULT_COLUMNS[result]
+        board = BoardState()
+        try:
+            for ply, san in enumerate(PGNGame({}, movetext).san_moves()):
+                if ply >= max_plies:
+                    break
+                piece, target = parse_san(board, san)
+                key = (board.position_hash, encode_move(board, piece, target))
+                entry = counts.get(key)
+                if entry is None:
+                    entry = counts[key] = [0, 0, 0]
+                entry[column] += 1
+                board = board.apply_move(piece, target[0], target[1])
+        except ValueError:
+            pass # Moves up to the first unreadable one still count
+    return counts
+
+def game_chunks(paths, chunk_games: int = CHUNK_GAMES):
+    # Finished games from the PGN files as lists of (result, movetext); games from a FEN start are skipped
+    chunk = []
+    for path in paths:
+        for game in read_pgn_file(path):
+            if game.result not in RESULT_COLUMNS or "FEN" in game.headers:
+                continue
+            chunk.append((game.result, game.movetext))
+            if len(chunk) == chunk_games:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+def write_run(counts: dict, directory: str) -> str:
+    fd, path = tempfile.mkstemp(suffix=".run", dir=directory)
+    with os.fdopen(fd, "wb") as f:
+        for (position_hash, move), (white, draws, black) in sorted(counts.items()):
+            f.write(ENTRY.pack(position_hash, move, white, draws, black))
+    return path
+
+def read_entries(path: str):
+    with open(path, "rb") as f:
+        while True:
+            data = f.read(ENTRY.size * 4096)
+            if not data:
+                break
+            yield from ENTRY.iter_unpack(data)
+
+def merge_runs(run_paths, output: str, games: int) -> int:
+    # k-way merge of sorted runs, summing the counts of equal (position, move) pairs; returns the entry count
+    entries = 0
+    with open(output, "wb") as f:
+        f.write(HEADER.pack(MAGIC, 0, games))
+        current = None
+        for position_hash, move, white, draws, black in heapq.merge(*(read_entries(path) for path in run_paths)):
+            if current is not None and current[0] == position_hash and current[1] == move:
+                current[2] += white
+                current[3] += draws
+                current[4] += black
+                continue
+            if current is not None:
+                f.write(ENTRY.pack(*current))
+                entries += 1
+            current = [position_hash, move, white, draws, black]
+        if current is not None:
+            f.write(ENTRY.pack(*current))
+            entries += 1
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, entries, games))
+    return entries
+
+def build_index(paths, output: str, workers: int = None, max_plies: int = MAX_PLIES, report=print) -> int:
+    # Stream games from paths through a process pool into sorted runs, then merge them into the index at output.
+    # At most two chunks per worker are in flight and counts are spilled every RUN_ENTRIES pairs, so memory stays
+    # bounded however many games there are
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    games = chunks_done = 0
+    counts = {}
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(output))) as directory:
+        runs = []
+        with ProcessPoolExecutor(workers) as executor:
+            pending = {}
+            chunks = game_chunks(paths)
+            exhausted = False
+            while pending or not exhausted:
+                while not exhausted and len(pending) < workers * 2:
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        exhausted = True
+                    else:
+                        pending[executor.submit(index_games, chunk, max_plies)] = len(chunk)
+                if not pending:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    games += pending.pop(future)
+                    chunks_done += 1
+                    for key, (white, draws, black) in future.result().items():
+                        entry = counts.get(key)
+                        if entry is None:
+                            counts[key] = [white, draws, black]
+                        else:
+                            entry[0] += white
+                            entry[1] += draws
+                            entry[2] += black
+                    if len(counts) >= RUN_ENTRIES:
+                        runs.append(write_run(counts, directory))
+                        counts = {}
+                    if chunks_done % REPORT_CHUNKS == 0:
+                        report(f"{games} games, {games / (time.perf_counter() - start):.1f} games/s")
+        if counts or not runs:
+            runs.append(write_run(counts, directory))
+        entries = merge_runs(runs, output, games)
+    report(f"Indexed {games} games into {entries} entries in {time.perf_counter() - start:.1f}s")
+    return entries
+
+class OpeningIndex:
+    def __init__(self, path: str):
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.entries, self.games = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an opening index")
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _hash_at(self, index: int) -> int:
+        return HASH.unpack_from(self.data, HEADER.size + index * ENTRY.size)[0]
+
+    def lookup(self, position_hash: int):
+        # [(packed move, white wins, draws, black wins)] for a position hash, by binary search over the entries
+        low, high = 0, self.entries
+        while low < high:
+            middle = (low + high) // 2
+            if self._hash_at(middle) < position_hash:
+                low = middle + 1
+            else:
+                high = middle
+        results = []
+        offset = HEADER.size + low * ENTRY.size
+        for index in range(low, self.entries):
+            entry_hash, move, white, draws, black = ENTRY.unpack_from(self.data, offset)
+            if entry_hash != position_hash:
+                break
+            results.append((move, white, draws, black))
+            offset += ENTRY.size
+        return results
+
+    def moves(self, board: BoardState):
+        # MoveStats for every move played in this position, most played first
+        stats = []
+        for move, white, draws, black in self.lookup(board.position_hash):
+            try:
+                piece, target = decode_move(board, move)
+            except ValueError:
+                continue # A hash collision with a different position
+            if piece.color != board.current_turn:
+                continue
+            stats.append(MoveStats(piece, target, move, white, draws, black, board.current_turn))
+        stats.sort(key=lambda stat: stat.games, reverse=True)
+        return stats
+
+def query(path: str, movetext: str):
+    board = BoardState()
+    for san in movetext.split():
+        piece, target = parse_san(board, san)
+        board = board.apply_move(piece, target[0], target[1])
+    with OpeningIndex(path) as index:
+        start = time.perf_counter()
+        stats = index.moves(board)
+        elapsed = time.perf_counter() - start
+        print(f"{index.games} games indexed; {sum(stat.games for stat in stats)} reached this position "
+              f"(query {elapsed * 1e6:.0f} us)")
+        for stat in stats:
+            san = move_to_san(board, stat.piece, stat.move[0], stat.move[1])
+            print(f"{san:8s} {stat.games:8d} games  {stat.score * 100:5.1f}%  "
+                  f"+{stat.white} ={stat.draws} -{stat.black}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and query a position-indexed opening explorer")
+    commands = parser.add_subparsers(dest="command", required=True)
+    index_parser = commands.add_parser("index", help="index PGN files")
+    index_parser.add_argument("output")
+    index_parser.add_argument("pgn", nargs="+")
+    index_parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    index_parser.add_argument("--max-plies", type=int, default=MAX_PLIES)
+    query_parser = commands.add_parser("query", help="show the moves played after a SAN move sequence")
+    query_parser.add_argument("index")
+    query_parser.add_argument("moves", nargs="?", default="")
+    args = parser.parse_args()
+
+    if args.command == "index":
+        build_index(args.pgn, args.output, args.workers, args.max_plies)
+    else:
+        try:
+            query(args.index, args.moves)
+        except ValueError as e:
+            print(e)
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
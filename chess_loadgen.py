@@ -0,0 +1,84 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+from chess_logic import BoardState
+from chess_uci import move_to_uci
+from chess_server import DEFAULT_HOST, DEFAULT_PORT
+
+# Load generator for chess_server: many concurrent clients sending analysis requests,
+# reporting throughput and latency percentiles.
+
+def random_positions(count: int, max_plies: int, seed: int):
+    # Move lists of short random games, so the server sees a mix of distinct positions
+    rng = random.Random(seed)
+    positions = []
+    for _ in range(count):
+        board = BoardState()
+        moves = []
+        for _ in range(rng.randint(0, max_plies)):
+            legal = board.legal_moves()
+            if not legal:
+                break
+            piece, move = rng.choice(legal)
+            moves.append(move_to_uci(piece, move))
+            board = board.apply_move(piece, move[0], move[1])
+        positions.append(moves)
+    return positions
+
+def percentile(sorted_values, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+async def run_client(host: str, port: int, requests: int, positions, args, latencies: list, errors: dict, rng):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for request_id in range(requests):
+            message = {"id": request_id, "moves": rng.choice(positions), "depth": args.depth}
+            if args.movetime:
+                message["movetime"] = args.movetime
+            start = time.perf_counter()
+            writer.write((json.dumps(message) + "\n").encode())
+            await writer.drain()
+            reply = json.loads(await reader.readline())
+            if "error" in reply:
+                errors[reply["error"]] = errors.get(reply["error"], 0) + 1
+            else:
+                latencies.append(time.perf_counter() - start)
+    finally:
+        writer.close()
+
+async def run(args):
+    positions = random_positions(args.positions, args.plies, args.seed)
+    latencies = []
+    errors = {}
+    per_client = max(1, args.requests // args.clients)
+    start = time.perf_counter()
+    await asyncio.gather(*(run_client(args.host, args.port, per_client, positions, args, latencies, errors,
+                                      random.Random(args.seed + i)) for i in range(args.clients)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    print(f"{len(latencies)} answered, {sum(errors.values())} errors {errors or ''} in {elapsed:.2f}s")
+    print(f"throughput {len(latencies) / elapsed:.1f} req/s")
+    print(f"latency p50 {percentile(latencies, 0.5) * 1000:.1f} ms, p99 {percentile(latencies, 0.99) * 1000:.1f} ms, "
+          f"max {(latencies[-1] if latencies else 0) * 1000:.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate load against chess_server and report latency")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=400, help="total requests across all clients")
+    parser.add_argument("--positions", type=int, default=50, help="distinct positions to draw requests from")
+    parser.add_argument("--plies", type=int, default=12, help="maximum random plies per position")
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--movetime", type=int, default=None, help="per-request time limit in milliseconds")
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 from enum import Enum
+import random
 
 class PieceType(Enum):
     PAWN = 1
@@ -31,11 +32,82 @@ class ChessPiece:
     def __hash__(self):
         return hash((self.type, self.color, self.row, self.col))
 
+# Zobrist keys for position hashing; a fixed seed keeps hashes stable between runs
+_zobrist_random = random.Random(0x5EED)
+ZOBRIST_PIECES = [_zobrist_random.getrandbits(64) for _ in range(len(PieceType) * len(PieceColor) * 64)]
+ZOBRIST_BLACK_TO_MOVE = _zobrist_random.getrandbits(64)
+ZOBRIST_CASTLING = [_zobrist_random.getrandbits(64) for _ in range(4)] # White O-O, White O-O-O, Black O-O, Black O-O-O
+ZOBRIST_EN_PASSANT = [_zobrist_random.getrandbits(64) for _ in range(8)] # By file
+
+def zobrist_piece_key(piece: ChessPiece) -> int:
+    return ZOBRIST_PIECES[((piece.type.value - 1) * 2 + piece.color.value - 1) * 64 + piece.row * 8 + piece.col]
+
+FIFTY_MOVE_HALFMOVES = 100
+
+KNIGHT_OFFSETS = [(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)]
+KING_OFFSETS = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+STRAIGHT_DIRECTIONS = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+DIAGONAL_DIRECTIONS = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+SLIDER_DIRECTIONS = {
+    PieceType.ROOK: STRAIGHT_DIRECTIONS,
+    PieceType.BISHOP: DIAGONAL_DIRECTIONS,
+    PieceType.QUEEN: STRAIGHT_DIRECTIONS + DIAGONAL_DIRECTIONS,
+}
+
+def piece_attacks(piece: ChessPiece, occupied: dict):
+    # Squares (row * 8 + col) the piece attacks, own pieces included, given a (row, col) -> piece map
+    row, col = piece.row, piece.col
+    squares = []
+    if piece.type == PieceType.PAWN:
+        r = row - 1 if piece.color == PieceColor.WHITE else row + 1
+        if 0 <= r <= 7:
+            if col > 0: squares.append(r * 8 + col - 1)
+            if col < 7: squares.append(r * 8 + col + 1)
+    elif piece.type == PieceType.KNIGHT or piece.type == PieceType.KING:
+        for dr, dc in (KNIGHT_OFFSETS if piece.type == PieceType.KNIGHT else KING_OFFSETS):
+            r, c = row + dr, col + dc
+            if 0 <= r <= 7 and 0 <= c <= 7:
+                squares.append(r * 8 + c)
+    else:
+        directions = SLIDER_DIRECTIONS[piece.type]
+        for dr, dc in directions:
+            r, c = row + dr, col + dc
+            while 0 <= r <= 7 and 0 <= c <= 7:
+                squares.append(r * 8 + c)
+                if (r, c) in occupied:
+                    break
+                r += dr
+                c += dc
+    return squares
+
+def slider_squares_reaching(row: int, col: int, occupied: dict):
+    # Squares of sliders (either color) whose rays reach (row, col)
+    squares = []
+    for directions, slider in ((STRAIGHT_DIRECTIONS, PieceType.ROOK), (DIAGONAL_DIRECTIONS, PieceType.BISHOP)):
+        for dr, dc in directions:
+            r, c = row + dr, col + dc
+            while 0 <= r <= 7 and 0 <= c <= 7:
+                piece = occupied.get((r, c))
+                if piece:
+                    if piece.type == slider or piece.type == PieceType.QUEEN: squares.append((r, c))
+                    break
+                r += dr
+                c += dc
+    return squares
+
 class BoardState:
-    def __init__(self, pieces=None, current_turn: PieceColor = PieceColor.WHITE, en_passant_target_square=None):
+    def __init__(self, pieces=None, current_turn: PieceColor = PieceColor.WHITE, en_passant_target_square=None,
+                 halfmove_clock: int = 0, previous_hashes: tuple = ()):
         self.pieces = pieces if pieces is not None else []
         self.current_turn = current_turn
         self.en_passant_target_square = en_passant_target_square
+        self.halfmove_clock = halfmove_clock # Halfmoves since the last capture or pawn move
+        self.previous_hashes = previous_hashes # Hashes of earlier positions since the last capture or pawn move
+        self._position_hash = None
+        self._pawn_hash = None
+        self._attack_maps = None
+        self._square_map = None
+        self._slider_reach = {} # (row, col) -> squares of sliders whose rays reach it
 
         if not self.pieces:
             self._setup_initial_board()
@@ -65,6 +137,109 @@ class BoardState:
         self.pieces.append(ChessPiece(PieceType.KNIGHT, PieceColor.WHITE, 7, 6))
         self.pieces.append(ChessPiece(PieceType.ROOK, PieceColor.WHITE, 7, 7))
 
+    @property
+    def position_hash(self) -> int:
+        # Computed on first use, after apply_move has finished updating the new board
+        if self._position_hash is None:
+            self._position_hash = self.compute_hash()
+        return self._position_hash
+
+    @property
+    def pawn_hash(self) -> int:
+        # Hash of pawn placement only, for caching pawn-structure evaluation
+        if self._pawn_hash is None:
+            h = 0
+            for piece in self.pieces:
+                if piece.type == PieceType.PAWN:
+                    h ^= zobrist_piece_key(piece)
+            self._pawn_hash = h
+        return self._pawn_hash
+
+    def compute_hash(self) -> int:
+        h = ZOBRIST_BLACK_TO_MOVE if self.current_turn == PieceColor.BLACK else 0
+        unmoved_kings = set()
+        unmoved_rooks = set()
+        for piece in self.pieces:
+            h ^= zobrist_piece_key(piece)
+            if not piece.has_moved:
+                if piece.type == PieceType.KING:
+                    unmoved_kings.add(piece.color)
+                elif piece.type == PieceType.ROOK:
+                    unmoved_rooks.add((piece.color, piece.col))
+        for i, color in enumerate((PieceColor.WHITE, PieceColor.BLACK)):
+            if color in unmoved_kings:
+                if (color, 7) in unmoved_rooks: h ^= ZOBRIST_CASTLING[i * 2]
+                if (color, 0) in unmoved_rooks: h ^= ZOBRIST_CASTLING[i * 2 + 1]
+        if self.en_passant_target_square:
+            h ^= ZOBRIST_EN_PASSANT[self.en_passant_target_square[1]]
+        return h
+
+    def repetition_count(self) -> int:
+        # How many times the current position has occurred, including now
+        return self.previous_hashes.count(self.position_hash) + 1
+
+    def is_threefold_repetition(self) -> bool:
+        return self.repetition_count() >= 3
+
+    def is_fifty_move_draw(self) -> bool:
+        return self.halfmove_clock >= FIFTY_MOVE_HALFMOVES
+
+    @property
+    def attack_maps(self):
+        # Per color, a list of 64 counts (index row * 8 + col) of how many pieces of that color attack each square.
+        # Built in full once for a root position; apply_move updates them incrementally from the parent.
+        if self._attack_maps is None:
+            self._attack_maps = self._compute_attack_maps()
+        return self._attack_maps
+
+    def attack_map(self, color: PieceColor):
+        return self.attack_maps[color.value - 1]
+
+    def attack_count(self, row: int, col: int, color: PieceColor) -> int:
+        return self.attack_maps[color.value - 1][row * 8 + col]
+
+    def _compute_attack_maps(self):
+        maps = ([0] * 64, [0] * 64)
+        occupied = self.square_map()
+        for piece in self.pieces:
+            counts = maps[piece.color.value - 1]
+            for square in piece_attacks(piece, occupied):
+                counts[square] += 1
+        return maps
+
+    def _updated_attack_maps(self, changed_squares, moved_pieces):
+        # Only pieces on a changed square, or sliders whose rays reach one, attack different squares after the move
+        before = self.square_map()
+        after = dict(before)
+        for square in changed_squares:
+            after.pop(square, None)
+        for piece in moved_pieces:
+            after[(piece.row, piece.col)] = piece
+
+        # A stationary slider can only see further or less far after the move if its ray already reached a changed
+        # square before it, so looking the sliders up on this (parent) board is enough. Siblings share most of
+        # their changed squares, so the lookups are cached per board.
+        affected = set(changed_squares)
+        for square in changed_squares:
+            sliders = self._slider_reach.get(square)
+            if sliders is None:
+                sliders = self._slider_reach[square] = slider_squares_reaching(square[0], square[1], before)
+            affected.update(sliders)
+
+        maps = (self.attack_maps[0][:], self.attack_maps[1][:])
+        for square in affected:
+            piece = before.get(square)
+            if piece:
+                counts = maps[piece.color.value - 1]
+                for target in piece_attacks(piece, before):
+                    counts[target] -= 1
+            piece = after.get(square)
+            if piece:
+                counts = maps[piece.color.value - 1]
+                for target in piece_attacks(piece, after):
+                    counts[target] += 1
+        return maps
+
     def get_piece_at(self, row: int, col: int):
         for piece in self.pieces:
             if piece.row == row and piece.col == col:
@@ -83,64 +258,77 @@ class BoardState:
         return piece is not None and piece.color != color
 
     def is_square_attacked(self, row: int, col: int, by_color: PieceColor) -> bool:
-        # Check for Pawn attacks
-        if by_color == PieceColor.WHITE:
-            if self.get_piece_at(row + 1, col - 1) and self.get_piece_at(row + 1, col - 1).type == PieceType.PAWN and self.get_piece_at(row + 1, col - 1).color == by_color: return True
-            if self.get_piece_at(row + 1, col + 1) and self.get_piece_at(row + 1, col + 1).type == PieceType.PAWN and self.get_piece_at(row + 1, col + 1).color == by_color: return True
-        else: # Black pawns
-            if self.get_piece_at(row - 1, col - 1) and self.get_piece_at(row - 1, col - 1).type == PieceType.PAWN and self.get_piece_at(row - 1, col - 1).color == by_color: return True
-            if self.get_piece_at(row - 1, col + 1) and self.get_piece_at(row - 1, col + 1).type == PieceType.PAWN and self.get_piece_at(row - 1, col + 1).color == by_color: return True
-
-        # Check for Knight attacks
-        knight_moves = [
-            (-2, -1), (-2, 1), (-1, -2), (-1, 2),
-            (1, -2), (1, 2), (2, -1), (2, 1)
-        ]
-        for dr, dc in knight_moves:
-            r, c = row + dr, col + dc
-            piece = self.get_piece_at(r, c)
-            if piece and piece.type == PieceType.KNIGHT and piece.color == by_color: return True
-
-        # Check for King attacks (only one square away)
-        king_moves = [
-            (-1, -1), (-1, 0), (-1, 1),
-            (0, -1), (0, 1),
-            (1, -1), (1, 0), (1, 1)
-        ]
-        for dr, dc in king_moves:
-            r, c = row + dr, col + dc
-            piece = self.get_piece_at(r, c)
-            if piece and piece.type == PieceType.KING and piece.color == by_color: return True
-
-        # Check for Rook/Queen (horizontal/vertical) attacks
-        straight_directions = [
-            (-1, 0), (1, 0), (0, -1), (0, 1)
-        ]
-        for dr, dc in straight_directions:
-            r, c = row + dr, col + dc
-            while 0 <= r <= 7 and 0 <= c <= 7:
-                piece = self.get_piece_at(r, c)
-                if piece:
-                    if piece.color == by_color and (piece.type == PieceType.ROOK or piece.type == PieceType.QUEEN): return True
-                    break # Blocked by another piece (either ally or enemy)
-                r += dr
-                c += dc
-
-        # Check for Bishop/Queen (diagonal) attacks
-        diagonal_directions = [
-            (-1, -1), (-1, 1), (1, -1), (1, 1)
-        ]
-        for dr, dc in diagonal_directions:
-            r, c = row + dr, col + dc
-            while 0 <= r <= 7 and 0 <= c <= 7:
-                piece = self.get_piece_at(r, c)
-                if piece:
-                    if piece.color == by_color and (piece.type == PieceType.BISHOP or piece.type == PieceType.QUEEN): return True
-                    break # Blocked by another piece (either ally or enemy)
-                r += dr
-                c += dc
-
-        return False
+        if not (0 <= row <= 7 and 0 <= col <= 7):
+            return False
+        return self.attack_maps[by_color.value - 1][row * 8 + col] > 0
+
+    def square_map(self) -> dict:
+        # (row, col) -> piece, built once per board; callers must copy it before modifying it
+        if self._square_map is None:
+            self._square_map = {(piece.row, piece.col): piece for piece in reversed(self.pieces)}
+        return self._square_map
+
+    def attackers_of(self, row: int, col: int, color: PieceColor, occupied: dict = None):
+        # Pieces of the given color attacking (row, col); occupied maps (row, col) -> piece and may have pieces removed
+        if occupied is None:
+            occupied = self.square_map()
+        attackers = []
+
+        pawn_row = row + 1 if color == PieceColor.WHITE else row - 1
+        for dc in (-1, 1):
+            piece = occupied.get((pawn_row, col + dc))
+            if piece and piece.type == PieceType.PAWN and piece.color == color: attackers.append(piece)
+
+        for dr, dc in KNIGHT_OFFSETS:
+            piece = occupied.get((row + dr, col + dc))
+            if piece and piece.type == PieceType.KNIGHT and piece.color == color: attackers.append(piece)
+
+        for dr, dc in KING_OFFSETS:
+            piece = occupied.get((row + dr, col + dc))
+            if piece and piece.type == PieceType.KING and piece.color == color: attackers.append(piece)
+
+        for directions, slider in ((STRAIGHT_DIRECTIONS, PieceType.ROOK), (DIAGONAL_DIRECTIONS, PieceType.BISHOP)):
+            for dr, dc in directions:
+                r, c = row + dr, col + dc
+                while 0 <= r <= 7 and 0 <= c <= 7:
+                    piece = occupied.get((r, c))
+                    if piece:
+                        if piece.color == color and (piece.type == slider or piece.type == PieceType.QUEEN): attackers.append(piece)
+                        break # Blocked; pieces further along are x-rays until this one is removed
+                    r += dr
+                    c += dc
+
+        return attackers
+
+    def is_capture(self, piece: ChessPiece, target_row: int, target_col: int) -> bool:
+        if self.is_occupied_by_enemy(target_row, target_col, piece.color):
+            return True
+        return piece.type == PieceType.PAWN and target_col != piece.col # En passant
+
+    def static_exchange(self, piece: ChessPiece, target_row: int, target_col: int, piece_values: dict, occupied: dict = None) -> int:
+        # Material balance for piece's side after the full exchange on the target square, with each side
+        # recapturing with its least valuable attacker and free to stop when continuing would lose material
+        occupied = dict(occupied if occupied is not None else self.square_map())
+        target = occupied.get((target_row, target_col))
+        gains = [piece_values[target.type] if target else piece_values[PieceType.PAWN] if piece.type == PieceType.PAWN else 0]
+        del occupied[(piece.row, piece.col)]
+        attacker_value = piece_values[piece.type] # Value of the piece now standing on the target square
+        color = PieceColor.BLACK if piece.color == PieceColor.WHITE else PieceColor.WHITE
+
+        while True:
+            attackers = self.attackers_of(target_row, target_col, color, occupied)
+            if not attackers:
+                break
+            attacker = min(attackers, key=lambda p: piece_values[p.type])
+            gains.append(attacker_value - gains[-1])
+            attacker_value = piece_values[attacker.type]
+            del occupied[(attacker.row, attacker.col)] # Uncovers any x-ray attacker behind it
+            color = PieceColor.BLACK if color == PieceColor.WHITE else PieceColor.WHITE
+
+        # Each side only continues the exchange if it does not lose by doing so
+        for i in range(len(gains) - 1, 0, -1):
+            gains[i - 1] = -max(-gains[i - 1], gains[i])
+        return gains[0]
 
     def is_king_in_check(self, color: PieceColor) -> bool:
         king = next((p for p in self.pieces if p.type == PieceType.KING and p.color == color), None)
@@ -151,9 +339,9 @@ class BoardState:
 
     def can_castle_king_side(self, color: PieceColor) -> bool:
         king = next((p for p in self.pieces if p.type == PieceType.KING and p.color == color), None)
-        king_side_rook = next((p for p in self.pieces if p.type == PieceType.ROOK and p.color == color and p.col == 7), None)
-
-        if king is None or king_side_rook is None: return False
+        if king is None: return False
+        king_side_rook = self.get_piece_at(king.row, 7) # The rook on the king's row, not any rook on that file
+        if king_side_rook is None or king_side_rook.type != PieceType.ROOK or king_side_rook.color != color: return False
         if king.has_moved or king_side_rook.has_moved: return False
 
         king_row = king.row
@@ -171,9 +359,9 @@ class BoardState:
 
     def can_castle_queen_side(self, color: PieceColor) -> bool:
         king = next((p for p in self.pieces if p.type == PieceType.KING and p.color == color), None)
-        queen_side_rook = next((p for p in self.pieces if p.type == PieceType.ROOK and p.color == color and p.col == 0), None)
-
-        if king is None or queen_side_rook is None: return False
+        if king is None: return False
+        queen_side_rook = self.get_piece_at(king.row, 0) # The rook on the king's row, not any rook on that file
+        if queen_side_rook is None or queen_side_rook.type != PieceType.ROOK or queen_side_rook.color != color: return False
         if king.has_moved or queen_side_rook.has_moved: return False
 
         king_row = king.row
@@ -189,7 +377,8 @@ class BoardState:
 
         return True
 
-    def calculate_possible_moves(self, piece: ChessPiece):
+    def calculate_pseudo_legal_moves(self, piece: ChessPiece):
+        # Moves by piece movement rules only; they may still leave the own king in check
         moves = []
         current_row, current_col = piece.row, piece.col
 
@@ -282,11 +471,18 @@ class BoardState:
             if self.can_castle_queen_side(piece.color):
                 moves.append((current_row, 2)) # King moves to c1 or c8
 
+        return moves
+
+    def is_legal_move(self, piece: ChessPiece, target_row: int, target_col: int) -> bool:
+        # Assumes the move is pseudo-legal; checks that it does not leave the own king in check
+        simulated_board = self.apply_move(piece, target_row, target_col, simulate=True)
+        return not simulated_board.is_king_in_check(piece.color)
+
+    def calculate_possible_moves(self, piece: ChessPiece):
         # Filter out moves that would leave the king in check
         legal_moves = []
-        for target_row, target_col in moves:
-            simulated_board = self.apply_move(piece, target_row, target_col, simulate=True)
-            if not simulated_board.is_king_in_check(piece.color):
+        for target_row, target_col in self.calculate_pseudo_legal_moves(piece):
+            if self.is_legal_move(piece, target_row, target_col):
                 legal_moves.append((target_row, target_col))
 
         return legal_moves
@@ -303,6 +499,11 @@ class BoardState:
         if piece_to_move is None: # Should not happen if piece is from current board
             return new_board
 
+        is_irreversible = piece_to_move.type == PieceType.PAWN
+        # For the attack map update
+        changed_squares = [(piece_to_move.row, piece_to_move.col), (target_row, target_col)]
+        moved_pieces = [piece_to_move]
+
         # Handle en passant capture
         if piece_to_move.type == PieceType.PAWN and target_col != piece_to_move.col and new_board.get_piece_at(target_row, target_col) is None:
             # This is an en passant capture
@@ -310,10 +511,12 @@ class BoardState:
             captured_pawn = new_board.get_piece_at(captured_pawn_row, target_col)
             if captured_pawn: # Ensure captured_pawn exists
                 new_board.pieces.remove(captured_pawn)
+                changed_squares.append((captured_pawn_row, target_col))
         else:
             captured_piece = new_board.get_piece_at(target_row, target_col)
             if captured_piece:
                 new_board.pieces.remove(captured_piece)
+                is_irreversible = True
 
         # Update piece position and has_moved
         piece_to_move.row = target_row
@@ -324,14 +527,18 @@ class BoardState:
         if piece_to_move.type == PieceType.KING and abs(piece.col - target_col) == 2:
             # King-side castling
             if target_col == 6:
-                rook = next((p for p in new_board.pieces if p.type == PieceType.ROOK and p.color == piece_to_move.color and p.col == 7), None)
-                if rook: # Ensure rook exists
+                rook = new_board.get_piece_at(target_row, 7) # The rook on the king's row
+                if rook and rook.type == PieceType.ROOK: # Ensure rook exists
+                    changed_squares += [(rook.row, rook.col), (rook.row, 5)]
+                    moved_pieces.append(rook)
                     rook.col = 5
                     rook.has_moved = True
             # Queen-side castling
             elif target_col == 2:
-                rook = next((p for p in new_board.pieces if p.type == PieceType.ROOK and p.color == piece_to_move.color and p.col == 0), None)
-                if rook: # Ensure rook exists
+                rook = new_board.get_piece_at(target_row, 0) # The rook on the king's row
+                if rook and rook.type == PieceType.ROOK: # Ensure rook exists
+                    changed_squares += [(rook.row, rook.col), (rook.row, 3)]
+                    moved_pieces.append(rook)
                     rook.col = 3
                     rook.has_moved = True
 
@@ -346,11 +553,25 @@ class BoardState:
         if piece.type == PieceType.PAWN and abs(piece.row - target_row) == 2:
             new_board.en_passant_target_square = (piece.row + (1 if piece.color == PieceColor.BLACK else -1), piece.col)
 
+        new_board._attack_maps = self._updated_attack_maps(changed_squares, moved_pieces)
+
         if not simulate:
             new_board.current_turn = PieceColor.BLACK if self.current_turn == PieceColor.WHITE else PieceColor.WHITE
+            # Earlier positions can never recur after a capture or pawn move, so the history restarts there
+            if is_irreversible:
+                new_board.halfmove_clock = 0
+                new_board.previous_hashes = ()
+            else:
+                new_board.halfmove_clock = self.halfmove_clock + 1
+                new_board.previous_hashes = self.previous_hashes + (self.position_hash,)
 
         return new_board
 
+    def legal_moves(self) -> list:
+        # Every legal move of the side to move, as (piece, (row, col))
+        return [(piece, move) for piece in self.pieces if piece.color == self.current_turn
+                for move in self.calculate_possible_moves(piece)]
+
     def has_any_legal_moves(self, color: PieceColor) -> bool:
         total_moves = 0
         for piece in self.pieces:
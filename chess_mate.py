@@ -0,0 +1,131 @@
+import time
+from chess_logic import BoardState
+
+# Mate-in-N solver using proof-number search. The tree alternates OR nodes (attacker to move: one move
+# has to force mate) and AND nodes (defender to move: every reply has to lose). Proof and disproof numbers
+# count the leaves that still have to be solved to prove or refute a node, and each step expands the
+# most-proving leaf, so the search concentrates on forcing lines instead of searching every quiet move
+# to a fixed depth.
+INFINITY = 1 << 30
+MAX_NODES = 200000
+# Initial proof number of a position after a quiet attacker move. Checking moves start at the number of
+# legal replies and are listed first, so forcing checks with one or two replies are tried before quiet moves;
+# larger values starve the quiet moves that mates with the king or a lone rook need
+QUIET_PROOF_NUMBER = 2
+
+class ProofNode:
+    __slots__ = ("board", "move", "parent", "children", "is_or", "remaining", "proof", "disproof", "replies")
+
+    def __init__(self, board: BoardState, move, parent, is_or: bool, remaining: int):
+        self.board = board
+        self.move = move # (piece, (row, col)) that led here
+        self.parent = parent
+        self.children = None # None until expanded
+        self.is_or = is_or
+        self.remaining = remaining # Attacker moves left, counting the one about to be played at an OR node
+        self.proof = 1
+        self.disproof = 1
+        self.replies = None # Defender replies at an AND node, once generated
+
+class MateSolver:
+    def __init__(self, max_nodes: int = MAX_NODES):
+        self.max_nodes = max_nodes
+        self.nodes = 0 # Nodes created by the last solve
+        self.deadline = None
+        self.stop_event = None
+
+    def solve(self, board: BoardState, max_moves: int, time_limit: float = None, stop_event=None):
+        # Forced mate for the side to move in at most max_moves moves, as a list of (piece, (row, col))
+        # alternating attacker and best defence, or None if none was found within the node and time budget
+        # or before stop_event (anything with is_set(), like threading.Event) was set.
+        # Proving at the full limit first is much cheaper than counting up from mate in one, since refuting
+        # the shorter limits is the expensive part; what is left of the budget then goes into shorter mates
+        self.nodes = 0
+        self.deadline = time.perf_counter() + time_limit if time_limit is not None else None
+        self.stop_event = stop_event
+        best_line = None
+        moves = max_moves
+        while moves > 0:
+            root = ProofNode(board, None, None, True, moves)
+            if not self._prove(root) or root.proof != 0:
+                break
+            plies, best_line = self._mating_line(root)
+            moves = (plies + 1) // 2 - 1
+        return best_line
+
+    def _out_of_budget(self) -> bool:
+        return (self.nodes >= self.max_nodes or (self.deadline is not None and time.perf_counter() >= self.deadline)
+                or (self.stop_event is not None and self.stop_event.is_set()))
+
+    def _prove(self, root: ProofNode) -> bool:
+        # Runs until the root is solved; returns False when the budget runs out first
+        while root.proof and root.disproof:
+            if self._out_of_budget():
+                return False
+            node = root
+            while node.children is not None: # Descend to the most-proving leaf
+                if node.is_or:
+                    node = min(node.children, key=lambda child: child.proof)
+                else:
+                    node = min(node.children, key=lambda child: child.disproof)
+            self._expand(node)
+            while node is not None:
+                self._update(node)
+                node = node.parent
+        return True
+
+    def _expand(self, node: ProofNode):
+        board = node.board
+        node.children = []
+        if node.is_or:
+            checks, quiet = [], []
+            for piece, move in board.legal_moves():
+                new_board = board.apply_move(piece, move[0], move[1])
+                gives_check = new_board.is_king_in_check(new_board.current_turn)
+                # Only a check can mate, so on the last move quiet moves are not worth a node
+                if not gives_check and node.remaining == 1:
+                    continue
+                child = ProofNode(new_board, (piece, move), node, False, node.remaining - 1)
+                (checks if gives_check else quiet).append(child)
+                self.nodes += 1
+                if gives_check:
+                    child.replies = new_board.legal_moves()
+                    if not child.replies: # Checkmate
+                        child.proof, child.disproof = 0, INFINITY
+                    elif child.remaining == 0:
+                        child.proof, child.disproof = INFINITY, 0
+                    else:
+                        child.proof = len(child.replies)
+                else:
+                    child.proof = QUIET_PROOF_NUMBER
+            node.children = checks + quiet
+        else:
+            if node.replies is None:
+                node.replies = board.legal_moves()
+            for piece, move in node.replies:
+                new_board = board.apply_move(piece, move[0], move[1])
+                node.children.append(ProofNode(new_board, (piece, move), node, True, node.remaining))
+                self.nodes += 1
+
+    def _update(self, node: ProofNode):
+        if not node.children: # No attacker moves worth trying, or a stalemated defender
+            node.proof, node.disproof = INFINITY, 0
+        elif node.is_or:
+            node.proof = min(child.proof for child in node.children)
+            node.disproof = min(INFINITY, sum(child.disproof for child in node.children))
+        else:
+            node.proof = min(INFINITY, sum(child.proof for child in node.children))
+            node.disproof = min(child.disproof for child in node.children)
+
+    def _mating_line(self, node: ProofNode):
+        # (plies to mate, line) below a proven node: the attacker mates fastest, the defender holds out longest
+        if node.children is None: # Checkmate on the board
+            return 0, []
+        best = None
+        for child in node.children:
+            if node.is_or and child.proof != 0:
+                continue
+            plies, line = self._mating_line(child)
+            if best is None or (plies < best[0] if node.is_or else plies > best[0]):
+                best = (plies, [child.move] + line)
+        return best[0] + 1, best[1]
@@ -0,0 +1,249 @@
+import re
+import sys
+import time
+from chess_logic import BoardState, PieceColor, PieceType, ChessPiece
+
+FILES = "abcdefgh"
+PIECE_LETTERS = {
+    PieceType.KNIGHT: "N",
+    PieceType.BISHOP: "B",
+    PieceType.ROOK: "R",
+    PieceType.QUEEN: "Q",
+    PieceType.KING: "K",
+}
+LETTER_PIECES = {letter: type for type, letter in PIECE_LETTERS.items()}
+RESULTS = ("1-0", "0-1", "1/2-1/2", "*")
+# Seven Tag Roster, written first and in this order
+STR_TAGS = ("Event", "Site", "Date", "Round", "White", "Black", "Result")
+
+TAG_RE = re.compile(r'^\[\s*(\w+)\s+"((?:[^"\\]|\\.)*)"\s*\]\s*$')
+# Comments, variations, NAGs and move numbers are matched so they can be skipped; a comment still open at the end of
+# the text is matched too, so read_games can follow one across lines
+TOKEN_RE = re.compile(r'\{[^}]*\}|\{[^}]*$|;[^\n]*|\(|\)|\$\d+|\d+\.+|1-0|0-1|1/2-1/2|\*|[^\s{}();.$]+')
+MOVE_NUMBER_RE = re.compile(r'^\d+\.+$')
+SAN_RE = re.compile(r'^([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([NBRQ]))?$')
+
+def square_name(row: int, col: int) -> str:
+    # Row 0 is Black's back rank (rank 8)
+    return f"{FILES[col]}{8 - row}"
+
+def parse_square(name: str):
+    return 8 - int(name[1]), FILES.index(name[0])
+
+def move_to_san(board: BoardState, piece: ChessPiece, target_row: int, target_col: int) -> str:
+    if piece.type == PieceType.KING and abs(target_col - piece.col) == 2:
+        san = "O-O" if target_col == 6 else "O-O-O"
+    else:
+        target = board.get_piece_at(target_row, target_col)
+        is_capture = target is not None or (piece.type == PieceType.PAWN and target_col != piece.col)
+        if piece.type == PieceType.PAWN:
+            san = FILES[piece.col] + "x" if is_capture else ""
+            san += square_name(target_row, target_col)
+            if target_row in (0, 7):
+                san += "=Q" # apply_move always promotes to a queen
+        else:
+            # Disambiguate against other pieces of the same type that can reach the target
+            rivals = [p for p in board.pieces if p.type == piece.type and p.color == piece.color and p is not piece
+                      and (target_row, target_col) in board.calculate_possible_moves(p)]
+            disambiguation = ""
+            if rivals:
+                if all(p.col != piece.col for p in rivals):
+                    disambiguation = FILES[piece.col]
+                elif all(p.row != piece.row for p in rivals):
+                    disambiguation = str(8 - piece.row)
+                else:
+                    disambiguation = square_name(piece.row, piece.col)
+            san = PIECE_LETTERS[piece.type] + disambiguation + ("x" if is_capture else "") + square_name(target_row, target_col)
+
+    new_board = board.apply_move(piece, target_row, target_col)
+    if new_board.is_king_in_check(new_board.current_turn):
+        san += "#" if not new_board.has_any_legal_moves(new_board.current_turn) else "+"
+    return san
+
+def parse_san(board: BoardState, san: str):
+    # Resolve a SAN move to (piece, (row, col)) for the side to move
+    text = san.rstrip("+#!?")
+    color = board.current_turn
+    if text in ("O-O", "0-0", "O-O-O", "0-0-0"):
+        king = next((p for p in board.pieces if p.type == PieceType.KING and p.color == color), None)
+        target = (king.row, 6 if len(text) == 3 else 2) if king else None
+        if king is None or target not in board.calculate_possible_moves(king):
+            raise ValueError(f"Illegal castling move: {san}")
+        return king, target
+
+    match = SAN_RE.match(text)
+    if not match:
+        raise ValueError(f"Invalid SAN move: {san}")
+    letter, from_file, from_rank, target_name, promotion = match.groups()
+    if promotion and promotion != "Q":
+        raise ValueError(f"Underpromotion is not supported: {san}")
+    type = LETTER_PIECES[letter] if letter else PieceType.PAWN
+    target = parse_square(target_name)
+    from_col = FILES.index(from_file) if from_file else None
+    from_row = 8 - int(from_rank) if from_rank else None
+
+    # Only the pieces SAN could refer to get move generation, and only those get the legality check
+    candidates = []
+    for piece in board.pieces:
+        if piece.type != type or piece.color != color: continue
+        if from_col is not None and piece.col != from_col: continue
+        if from_row is not None and piece.row != from_row: continue
+        if target in board.calculate_pseudo_legal_moves(piece):
+            candidates.append(piece)
+    if len(candidates) > 1:
+        candidates = [p for p in candidates if board.is_legal_move(p, *target)]
+    elif candidates and not board.is_legal_move(candidates[0], *target):
+        candidates = []
+
+    if not candidates:
+        raise ValueError(f"Illegal move: {san}")
+    if len(candidates) > 1:
+        raise ValueError(f"Ambiguous move: {san}")
+    return candidates[0], target
+
+class PGNGame:
+    def __init__(self, headers: dict, movetext: str):
+        self.headers = headers
+        self.movetext = movetext
+
+    def __repr__(self):
+        return f"PGNGame({self.headers.get('White', '?')} - {self.headers.get('Black', '?')}, {self.result})"
+
+    @property
+    def result(self) -> str:
+        return self.headers.get("Result", "*")
+
+    def san_moves(self):
+        depth = 0 # Variation nesting; moves inside variations are skipped
+        for token in TOKEN_RE.findall(self.movetext):
+            if token == "(":
+                depth += 1
+            elif token == ")":
+                depth = max(0, depth - 1)
+            elif depth or token[0] in "{;$" or token in RESULTS or MOVE_NUMBER_RE.match(token):
+                continue
+            else:
+                yield token
+
+    def moves(self):
+        # Lazily replay the game, yielding (board before the move, piece, (row, col))
+        if "FEN" in self.headers:
+            raise ValueError("Games starting from a FEN position are not supported")
+        board = BoardState()
+        for san in self.san_moves():
+            piece, target = parse_san(board, san)
+            yield board, piece, target
+            board = board.apply_move(piece, target[0], target[1])
+
+def read_games(stream):
+    # Stream games from a text file object; only the current game is held in memory. A game ends at a result token
+    # outside comments and variations, so the comment and variation state is carried from line to line
+    headers = {}
+    movetext = []
+    in_comment = False # Inside a {...} comment that continues on a later line
+    depth = 0 # Variation nesting
+    for line in stream:
+        line = line.strip()
+        if not in_comment and line.startswith("%"): # Escape mechanism, ignored
+            continue
+        if not in_comment and line.startswith("["):
+            if movetext:
+                yield PGNGame(headers, "\n".join(movetext))
+                headers, movetext = {}, []
+            depth = 0
+            match = TAG_RE.match(line)
+            if match:
+                headers[match.group(1)] = match.group(2).replace('\\"', '"').replace("\\\\", "\\")
+        elif line:
+            movetext.append(line) # Lines are joined with newlines, which end ; comments
+            if in_comment:
+                end = line.find("}")
+                if end < 0:
+                    continue
+                in_comment = False
+                line = line[end + 1:]
+            ended = False
+            for token in TOKEN_RE.findall(line):
+                if token[0] == "{" and not token.endswith("}"):
+                    in_comment = True
+                elif token == "(":
+                    depth += 1
+                elif token == ")":
+                    depth = max(0, depth - 1)
+                elif token in RESULTS and depth == 0:
+                    ended = True
+            if ended:
+                yield PGNGame(headers, "\n".join(movetext))
+                headers, movetext = {}, []
+    if headers or movetext:
+        yield PGNGame(headers, "\n".join(movetext))
+
+def read_pgn_file(path: str):
+    with open(path, encoding="utf-8", errors="replace") as f:
+        yield from read_games(f)
+
+def iter_san(moves):
+    # Convert (piece, (row, col)) moves from the starting position to SAN, as played by main.py or ChessAI
+    board = BoardState()
+    for piece, (target_row, target_col) in moves:
+        actual_piece = board.get_piece_at(piece.row, piece.col)
+        if actual_piece is None or actual_piece.color != board.current_turn:
+            raise ValueError(f"No {board.current_turn.name.lower()} piece on {square_name(piece.row, piece.col)}")
+        yield move_to_san(board, actual_piece, target_row, target_col)
+        board = board.apply_move(actual_piece, target_row, target_col)
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+def game_to_pgn(moves, headers: dict = None, result: str = "*") -> str:
+    headers = dict(headers or {})
+    headers["Result"] = result
+    lines = [f'[{tag} "{_escape(headers.get(tag, "?"))}"]' for tag in STR_TAGS]
+    lines += [f'[{tag} "{_escape(value)}"]' for tag, value in headers.items() if tag not in STR_TAGS]
+    lines.append("")
+
+    tokens = []
+    for i, san in enumerate(iter_san(moves)):
+        if i % 2 == 0:
+            tokens.append(f"{i // 2 + 1}.")
+        tokens.append(san)
+    tokens.append(result)
+
+    # Wrap movetext below 80 columns
+    line = ""
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > 79:
+            lines.append(line)
+            line = token
+        else:
+            line = f"{line} {token}" if line else token
+    lines.append(line)
+    return "\n".join(lines) + "\n\n"
+
+def write_game(stream, moves, headers: dict = None, result: str = "*"):
+    stream.write(game_to_pgn(moves, headers, result))
+
+def result_for(board: BoardState) -> str:
+    # PGN result tag for a finished (or unfinished) game
+    if board.is_checkmate(board.current_turn):
+        return "1-0" if board.current_turn == PieceColor.BLACK else "0-1"
+    if board.is_stalemate(board.current_turn) or board.is_threefold_repetition() or board.is_fifty_move_draw():
+        return "1/2-1/2"
+    return "*"
+
+def benchmark(path: str, replay: bool = True):
+    games = plies = 0
+    start = time.perf_counter()
+    for game in read_pgn_file(path):
+        games += 1
+        if replay:
+            plies += sum(1 for _ in game.moves())
+    elapsed = time.perf_counter() - start
+    print(f"{games} games, {plies} plies in {elapsed:.2f}s: "
+          f"{games / elapsed:.1f} games/s, {plies / elapsed:.1f} plies/s")
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("usage: python chess_pgn.py FILE.pgn [--headers-only]")
+        sys.exit(1)
+    benchmark(sys.argv[1], replay="--headers-only" not in sys.argv[2:])
@@ -0,0 +1,257 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import numpy as np
+from chess_logic import BoardState, PieceColor
+from chess_ai import ChessAI
+from chess_encoding import POSITION_SIZE, encode_move, encode_position
+
+# Self-play training data: positions from engine-vs-engine games labeled with the search score and the game result.
+#   python chess_selfplay.py generate data/ --games 1000     play games in worker processes and append to data/
+#   python chess_selfplay.py info data/                      record counts and label statistics
+#
+# A dataset is a directory of shard files plus dataset.json. Shard files have no header: they are arrays of
+# fixed-size little-endian RECORD structs, so np.memmap(path, dtype=RECORD) (or load_shards) reads them in place:
+#   hash      position hash (uint64)
+#   position  packed position (36 bytes, chess_encoding.encode_position)
+#   score     search score for White (int32, centipawns)
+#   move      move played, packed (uint16, chess_encoding.encode_move)
+#   ply       ply of the position in its game (uint16)
+#   result    final game result for White: 1 win, 0 draw, -1 loss (int8)
+#   depth     completed search depth of the score (uint8)
+#   reserved  2 bytes, zero, pads the record to 56 bytes
+# Records go to shard hash % shards and a position already in the dataset is not written again, so every shard
+# holds distinct positions and new games can be appended to an existing dataset at any time.
+RECORD = np.dtype([
+    ("hash", "<u8"),
+    ("position", "u1", (POSITION_SIZE,)),
+    ("score", "<i4"),
+    ("move", "<u2"),
+    ("ply", "<u2"),
+    ("result", "i1"),
+    ("depth", "u1"),
+    ("reserved", "u1", (2,)),
+])
+METADATA_FILE = "dataset.json"
+SHARDS = 16
+DEPTH = 1 # Search depth per move; depth 1 plus quiescence is about 10 ms a move, depth 2 about eight times that
+RANDOM_PLIES = 8 # Random opening moves before the engine takes over, so games do not all repeat each other
+MAX_GAME_PLIES = 300 # Longer games are adjudicated as draws
+RESIGN_SCORE = 1000 # A game is adjudicated once one side's score stays beyond this ...
+RESIGN_PLIES = 6 # ... for this many plies in a row
+GAMES_PER_TASK = 4
+REPORT_TASKS = 25 # Progress is reported every this many tasks
+
+def shard_path(directory: str, shard: int) -> str:
+    return os.path.join(directory, f"shard-{shard:03d}.bin")
+
+def random_opening(board: BoardState, plies: int, rng: random.Random) -> BoardState:
+    for _ in range(plies):
+        moves = board.legal_moves()
+        if not moves:
+            break
+        piece, (row, col) = rng.choice(moves)
+        board = board.apply_move(piece, row, col)
+    return board
+
+def play_game(ai: ChessAI, rng: random.Random, depth: int = DEPTH, random_plies: int = RANDOM_PLIES) -> np.ndarray:
+    # One self-play game from a random opening; returns a RECORD array of every searched position
+    board = random_opening(BoardState(), random_plies, rng)
+    ply = random_plies
+    hashes, positions, scores, moves, plies, depths = [], [], [], [], [], []
+    result = 0
+    lopsided = 0 # Plies in a row with one side beyond RESIGN_SCORE
+    while ply < MAX_GAME_PLIES and not board.is_threefold_repetition() and not board.is_fifty_move_draw():
+        move, score, completed_depth = ai.search(board, board.current_turn, max_depth=depth)
+        if move is None: # Checkmate or stalemate
+            if board.is_king_in_check(board.current_turn):
+                result = -1 if board.current_turn == PieceColor.WHITE else 1
+            break
+        piece, (row, col) = move
+        piece = board.get_piece_at(piece.row, piece.col)
+        score = score if board.current_turn == PieceColor.WHITE else -score
+        hashes.append(board.position_hash)
+        positions.append(encode_position(board))
+        scores.append(score)
+        moves.append(encode_move(board, piece, (row, col)))
+        plies.append(ply)
+        depths.append(completed_depth)
+        if abs(score) >= RESIGN_SCORE and (lopsided == 0 or (score > 0) == (scores[-2] > 0)):
+            lopsided += 1
+            if lopsided >= RESIGN_PLIES:
+                result = 1 if score > 0 else -1
+                break
+        else:
+            lopsided = 1 if abs(score) >= RESIGN_SCORE else 0
+        board = board.apply_move(piece, row, col)
+        ply += 1
+
+    records = np.zeros(len(hashes), dtype=RECORD)
+    records["hash"] = hashes
+    records["position"] = np.frombuffer(b"".join(positions), dtype=np.uint8).reshape(-1, POSITION_SIZE)
+    records["score"] = np.clip(scores, np.iinfo(np.int32).min, np.iinfo(np.int32).max)
+    records["move"] = moves
+    records["ply"] = plies
+    records["result"] = result
+    records["depth"] = depths
+    return records
+
+def play_games(games: int, seed: int, depth: int = DEPTH, random_plies: int = RANDOM_PLIES) -> np.ndarray:
+    # Runs in a worker process. One ChessAI plays every game, so its caches carry over between games
+    rng = random.Random(seed)
+    ai = ChessAI(depth=depth) # Searches are limited by depth only, so no time goes to the mate solver
+    return np.concatenate([play_game(ai, rng, depth, random_plies) for _ in range(games)])
+
+class SelfPlayDataset:
+    # Append-only writer for a dataset directory; remembers the hashes of every stored position for deduplication
+    def __init__(self, directory: str, shards: int = SHARDS):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        metadata_path = os.path.join(directory, METADATA_FILE)
+        if os.path.exists(metadata_path):
+            with open(metadata_path) as f:
+                metadata = json.load(f)
+            if metadata["record_size"] != RECORD.itemsize:
+                raise ValueError(f"{directory} holds {metadata['record_size']}-byte records, not {RECORD.itemsize}")
+            shards = metadata["shards"] # The shard of a position depends on the count, so it never changes
+        else:
+            with open(metadata_path, "w") as f:
+                json.dump({"record_size": RECORD.itemsize, "shards": shards, "fields": RECORD.names}, f, indent=2)
+        self.shards = shards
+        self.files = []
+        self.known = [] # Sorted hashes stored in each shard
+        for shard in range(shards):
+            path = shard_path(directory, shard)
+            f = open(path, "ab")
+            size = f.seek(0, os.SEEK_END)
+            if size % RECORD.itemsize: # A partial record from an interrupted write
+                f.truncate(size - size % RECORD.itemsize)
+            self.files.append(f)
+            self.known.append(np.unique(read_shard(path)["hash"]))
+
+    def __len__(self):
+        return sum(len(known) for known in self.known)
+
+    def close(self):
+        for f in self.files:
+            f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def append(self, records: np.ndarray) -> int:
+        # Write the records whose positions are new to the dataset; returns how many were written
+        _, first = np.unique(records["hash"], return_index=True)
+        records = records[np.sort(first)]
+        shard_ids = records["hash"] % np.uint64(self.shards)
+        added = 0
+        for shard in np.unique(shard_ids):
+            part = records[shard_ids == shard]
+            known = self.known[shard]
+            index = np.searchsorted(known, part["hash"])
+            seen = np.zeros(len(part), dtype=bool)
+            inside = index < len(known)
+            seen[inside] = known[index[inside]] == part["hash"][inside]
+            part = part[~seen]
+            if len(part) == 0:
+                continue
+            self.files[shard].write(part.tobytes())
+            self.files[shard].flush() # Readers mapping the shard see whole records only
+            new_hashes = np.sort(part["hash"])
+            self.known[shard] = np.insert(known, np.searchsorted(known, new_hashes), new_hashes)
+            added += len(part)
+        return added
+
+def read_shard(path: str) -> np.ndarray:
+    # The records of one shard file, memory-mapped read-only; a trailing partial record is left out
+    count = os.path.getsize(path) // RECORD.itemsize if os.path.exists(path) else 0
+    if count == 0:
+        return np.zeros(0, dtype=RECORD)
+    return np.memmap(path, dtype=RECORD, mode="r", shape=(count,))
+
+def load_shards(directory: str):
+    # Every shard of a dataset as a memory-mapped RECORD array
+    with open(os.path.join(directory, METADATA_FILE)) as f:
+        shards = json.load(f)["shards"]
+    return [read_shard(shard_path(directory, shard)) for shard in range(shards)]
+
+def generate(directory: str, games: int, workers: int = None, depth: int = DEPTH, random_plies: int = RANDOM_PLIES,
+             shards: int = SHARDS, seed: int = None, report=print) -> int:
+    # Play games in a process pool and stream their records into the dataset; returns the positions added.
+    # At most two tasks per worker are in flight, and records are written as each task finishes
+    workers = workers or os.cpu_count() or 1
+    seed = seed if seed is not None else random.randrange(1 << 32)
+    start = time.perf_counter()
+    games_done = tasks_done = positions = added = 0
+    with SelfPlayDataset(directory, shards) as dataset, ProcessPoolExecutor(workers) as executor:
+        pending = {}
+        games_left = games
+        while pending or games_left:
+            while games_left and len(pending) < workers * 2:
+                task_games = min(GAMES_PER_TASK, games_left)
+                task_seed = seed + games - games_left
+                pending[executor.submit(play_games, task_games, task_seed, depth, random_plies)] = task_games
+                games_left -= task_games
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                games_done += pending.pop(future)
+                tasks_done += 1
+                records = future.result()
+                positions += len(records)
+                added += dataset.append(records)
+                if tasks_done % REPORT_TASKS == 0:
+                    elapsed = time.perf_counter() - start
+                    report(f"{games_done} games, {added} new positions of {positions}, "
+                           f"{added / elapsed * 3600:.0f} positions/hour")
+        total = len(dataset)
+    report(f"Played {games_done} games in {time.perf_counter() - start:.1f}s: {added} new positions of {positions}, "
+           f"{total} in the dataset")
+    return added
+
+def info(directory: str):
+    shards = load_shards(directory)
+    total = sum(len(records) for records in shards)
+    print(f"{total} positions in {len(shards)} shards ({total * RECORD.itemsize / 1e6:.1f} MB)")
+    if not total:
+        return
+    results = np.concatenate([records["result"] for records in shards])
+    scores = np.concatenate([records["score"] for records in shards])
+    print(f"results  +{np.count_nonzero(results == 1)} ={np.count_nonzero(results == 0)} "
+          f"-{np.count_nonzero(results == -1)}")
+    print(f"scores   mean {scores.mean():.1f}, median {np.median(scores):.0f}, "
+          f"range {scores.min()} to {scores.max()}")
+    print(f"shards   {min(len(records) for records in shards)} to {max(len(records) for records in shards)} records")
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate labeled training positions from self-play")
+    commands = parser.add_subparsers(dest="command", required=True)
+    generate_parser = commands.add_parser("generate", help="play games and append their positions to a dataset")
+    generate_parser.add_argument("directory")
+    generate_parser.add_argument("--games", type=int, default=100)
+    generate_parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    generate_parser.add_argument("--depth", type=int, default=DEPTH)
+    generate_parser.add_argument("--random-plies", type=int, default=RANDOM_PLIES)
+    generate_parser.add_argument("--shards", type=int, default=SHARDS, help="shard count of a new dataset")
+    generate_parser.add_argument("--seed", type=int, default=None)
+    info_parser = commands.add_parser("info", help="summarize a dataset")
+    info_parser.add_argument("directory")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "generate":
+            generate(args.directory, args.games, args.workers, args.depth, args.random_plies, args.shards, args.seed)
+        else:
+            info(args.directory)
+    except (ValueError, FileNotFoundError) as e:
+        print(e)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from chess_logic import BoardState
+from chess_ai import ChessAI, BoundedCache
+from chess_uci import apply_uci_move, move_to_uci
+
+# Local analysis server. Clients connect over TCP and send one JSON object per line:
+#   {"id": 1, "moves": ["e2e4", "e7e5"], "depth": 3, "movetime": 500}   analyze the position after these moves
+#   {"cancel": 1}                                                        abort request 1 on this connection
+# Each request gets one JSON line back, matched by "id":
+#   {"id": 1, "bestmove": "g1f3", "score": 35, "depth": 3, "nodes": 2130, "time": 412, "cached": false}
+#   {"id": 1, "error": "busy"}
+#   {"id": 1, "error": "cancelled"}                                      cancelled before a worker picked it up
+# Ids are strings, integers or absent (null); anything other than a JSON object is answered {"error": "invalid request"}.
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_DEPTH = 3
+MAX_DEPTH = 8
+MAX_MOVETIME = 30000 # Milliseconds
+ANALYSIS_TABLE_SIZE = 1 << 16
+
+# Per-process state of the pool workers
+_worker_ai = None
+_stop_flags = None
+
+class StopFlag:
+    # Event-like view of one slot of the shared stop flag array; cheap enough to poll at every search node
+    def __init__(self, slot: int):
+        self.slot = slot
+
+    def is_set(self) -> bool:
+        return _stop_flags[self.slot] != 0
+
+def _init_worker(stop_flags):
+    global _worker_ai, _stop_flags
+    _worker_ai = ChessAI(depth=DEFAULT_DEPTH) # Kept for the life of the process, so its caches stay warm
+    _stop_flags = stop_flags
+
+def analyze_position(moves, depth: int, movetime, slot: int) -> dict:
+    # Runs in a worker process
+    board = BoardState()
+    for text in moves:
+        board = apply_uci_move(board, text)
+    start = time.perf_counter()
+    best_move, score, completed_depth = _worker_ai.search(board, board.current_turn, max_depth=depth,
+                                                          time_limit=movetime, stop_event=StopFlag(slot))
+    return {
+        "bestmove": move_to_uci(*best_move) if best_move else None,
+        "score": score,
+        "depth": completed_depth,
+        "nodes": _worker_ai.nodes,
+        "time": int((time.perf_counter() - start) * 1000),
+    }
+
+class AnalysisServer:
+    def __init__(self, workers: int = None, max_pending: int = None):
+        self.workers = workers or os.cpu_count() or 1
+        # Requests beyond this many queued or running are refused with "busy"
+        self.max_pending = max_pending or self.workers * 4
+        self.context = multiprocessing.get_context("spawn") # Workers never inherit the server's sockets or event loop
+        self.stop_flags = self.context.Array("b", self.max_pending, lock=False)
+        self.free_slots = list(range(self.max_pending))
+        self.executor = self._new_executor()
+        # Results shared by all clients and workers, by move list: cheap to key on without replaying the moves
+        self.table = BoundedCache(ANALYSIS_TABLE_SIZE)
+        self.requests = 0
+        self.rejected = 0
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(self.workers, mp_context=self.context, initializer=_init_worker,
+                                   initargs=(self.stop_flags,))
+
+    async def serve(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+        server = await asyncio.start_server(self.handle_client, host, port)
+        print(f"Analysis server on {host}:{port} with {self.workers} workers, {self.max_pending} pending requests max")
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        slots = {} # Request id -> stop flag slot, for requests of this connection still running
+        tasks = set()
+
+        async def send(message: dict):
+            writer.write((json.dumps(message) + "\n").encode())
+            await writer.drain() # Slow readers hold up their own connection only
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    await send({"error": "invalid json"})
+                    continue
+                if not isinstance(message, dict) or not isinstance(message.get("id"), (str, int, type(None))):
+                    await send({"error": "invalid request"})
+                    continue
+                if "cancel" in message:
+                    if not isinstance(message["cancel"], (str, int)):
+                        await send({"error": "invalid request"})
+                        continue
+                    slot = slots.get(message["cancel"])
+                    if slot is not None:
+                        self.stop_flags[slot] = 1
+                    continue
+                # The slot is taken here rather than in the task: a cancel already buffered behind this request is
+                # read before the task first runs, and has to find the slot
+                request = await self.accept_request(message, slots, send)
+                if request is None:
+                    continue
+                task = asyncio.create_task(self.run_request(*request, slots, send))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except ConnectionError:
+            pass
+        finally:
+            # A disconnected client's searches are of no use to anyone
+            for slot in slots.values():
+                self.stop_flags[slot] = 1
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            writer.close()
+
+    async def accept_request(self, message: dict, slots: dict, send):
+        # Validate a request and answer it from the table or refuse it; otherwise reserve a stop flag slot and
+        # return (id, moves, depth, movetime, slot) for run_request. Only cheap checks run here, on the event loop:
+        # the moves are replayed once, in the worker
+        request_id = message.get("id")
+        self.requests += 1
+        try:
+            moves = message.get("moves", [])
+            if not isinstance(moves, list):
+                raise TypeError("moves must be a list")
+            moves = tuple(str(text) for text in moves)
+            depth = min(int(message.get("depth", DEFAULT_DEPTH)), MAX_DEPTH)
+            movetime = min(int(message["movetime"]), MAX_MOVETIME) / 1000 if "movetime" in message else None
+        except (ValueError, TypeError) as e:
+            await send({"id": request_id, "error": f"invalid request: {e}"})
+            return None
+
+        cached = self.table.get(moves)
+        if cached is not None and cached["depth"] >= depth:
+            await send({"id": request_id, **cached, "cached": True})
+            return None
+
+        if request_id in slots:
+            await send({"id": request_id, "error": "duplicate id"})
+            return None
+        if not self.free_slots:
+            self.rejected += 1
+            await send({"id": request_id, "error": "busy"})
+            return None
+        slot = self.free_slots.pop()
+        self.stop_flags[slot] = 0
+        slots[request_id] = slot
+        return request_id, moves, depth, movetime, slot
+
+    async def run_request(self, request_id, moves: tuple, depth: int, movetime, slot: int, slots: dict, send):
+        executor = self.executor
+        try:
+            if self.stop_flags[slot]: # Cancelled before it reached the pool
+                reply = {"id": request_id, "error": "cancelled"}
+            else:
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(executor, analyze_position, moves, depth, movetime, slot)
+                cancelled = self.stop_flags[slot] != 0
+                if result["depth"] > 0 and not cancelled:
+                    self.table.put(moves, result)
+                reply = {"id": request_id, **result, "cached": False, "cancelled": cancelled}
+        except ValueError as e: # An illegal or malformed move, found by the worker's replay
+            reply = {"id": request_id, "error": f"invalid request: {e}"}
+        except Exception as e:
+            # A worker that died takes the whole pool with it; start a new one for the requests that follow
+            if isinstance(e, BrokenProcessPool) and self.executor is executor:
+                self.executor = self._new_executor()
+                executor.shutdown(wait=False)
+            reply = {"id": request_id, "error": f"analysis failed: {e!r}"}
+        finally:
+            del slots[request_id]
+            self.free_slots.append(slot)
+        try:
+            await send(reply)
+        except ConnectionError:
+            pass
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve ChessAI move analysis over TCP (JSON lines)")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--max-pending", type=int, default=None, help="queued + running requests before refusing")
+    args = parser.parse_args()
+
+    server = AnalysisServer(args.workers, args.max_pending)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+from array import array
+from chess_logic import BoardState
+from chess_ai import BoundedCache
+from chess_encoding import encode_move, decode_move, encode_position, decode_position, decode_game
+
+# Move history of one game with random access to every ply. Moves are kept packed (16 bits each) with a packed
+# position snapshot every SNAPSHOT_INTERVAL plies, so any ply is rebuilt from the nearest snapshot by replaying
+# fewer than SNAPSHOT_INTERVAL moves. Recently visited boards and their legal moves are cached.
+SNAPSHOT_INTERVAL = 8
+BOARD_CACHE_SIZE = 256
+
+class GameTimeline:
+    def __init__(self, board: BoardState = None):
+        self.start = board if board is not None else BoardState()
+        self.moves = array("H") # Packed move played at each ply
+        self.hashes = array("Q", [self.start.position_hash]) # Position hash at each ply, for repetition history
+        self.snapshots = [encode_position(self.start)] # Snapshot i is the position at ply i * SNAPSHOT_INTERVAL
+        self.boards = BoundedCache(BOARD_CACHE_SIZE) # Board by ply
+        self.legal_moves_cache = BoundedCache(BOARD_CACHE_SIZE) # {(row, col): legal moves} by ply
+        self.boards.put(0, self.start)
+
+    def __len__(self):
+        # Plies played; ply len(self) is the current position
+        return len(self.moves)
+
+    def push(self, piece, target) -> BoardState:
+        # Play a move in the current position and return the new board
+        board = self.board_at(len(self))
+        piece = board.get_piece_at(piece.row, piece.col)
+        new_board = board.apply_move(piece, target[0], target[1])
+        self.moves.append(encode_move(board, piece, target))
+        self.hashes.append(new_board.position_hash)
+        if len(self) % SNAPSHOT_INTERVAL == 0:
+            self.snapshots.append(encode_position(new_board))
+        self.boards.put(len(self), new_board)
+        return new_board
+
+    def truncate(self, ply: int):
+        # Drop every move after ply, e.g. to undo moves
+        ply = max(0, min(ply, len(self)))
+        del self.moves[ply:]
+        del self.hashes[ply + 1:]
+        del self.snapshots[ply // SNAPSHOT_INTERVAL + 1:]
+        for cache in (self.boards, self.legal_moves_cache):
+            for cached_ply in [key for key in cache.entries if key > ply]:
+                del cache.entries[cached_ply]
+
+    def board_at(self, ply: int) -> BoardState:
+        board = self.boards.get(ply)
+        if board is not None:
+            return board
+        if not 0 <= ply <= len(self):
+            raise IndexError(f"Ply {ply} is outside the game (0-{len(self)})")
+        snapshot_ply = ply - ply % SNAPSHOT_INTERVAL
+        board = self.boards.get(snapshot_ply) or self._from_snapshot(snapshot_ply)
+        for current in range(snapshot_ply, ply):
+            piece, target = decode_move(board, self.moves[current])
+            board = board.apply_move(piece, target[0], target[1])
+        self.boards.put(ply, board)
+        return board
+
+    def _from_snapshot(self, ply: int) -> BoardState:
+        if ply == 0:
+            return self.start
+        board = decode_position(self.snapshots[ply // SNAPSHOT_INTERVAL])
+        # Snapshots leave out the repetition history, which is the hashes since the last irreversible move
+        board.previous_hashes = tuple(self.hashes[ply - board.halfmove_clock:ply])
+        return board
+
+    def legal_moves(self, ply: int, piece) -> list:
+        # Legal moves of the piece on piece's square at ply
+        moves = self.legal_moves_cache.get(ply)
+        if moves is None:
+            moves = {}
+            self.legal_moves_cache.put(ply, moves)
+        square = (piece.row, piece.col)
+        if square not in moves:
+            board = self.board_at(ply)
+            moves[square] = board.calculate_possible_moves(board.get_piece_at(*square))
+        return moves[square]
+
+    def move_at(self, ply: int):
+        # (piece, (row, col)) played at ply, with the piece of board_at(ply)
+        return decode_move(self.board_at(ply), self.moves[ply])
+
+    def played_moves(self):
+        # Every move as (piece, (row, col)) from the start, e.g. for chess_pgn.game_to_pgn
+        return [(piece, target) for _, piece, target in decode_game(self.moves, self.start)]
@@ -0,0 +1,180 @@
+import sys
+import threading
+import time
+from chess_logic import BoardState, PieceColor, PieceType
+from chess_ai import ChessAI, MATE_SCORE
+from chess_encoding import parse_fen
+
+# Headless UCI front end for ChessAI. Only chess_logic and chess_ai are imported (no pygame),
+# so starting an engine process costs little more than starting the interpreter.
+ENGINE_NAME = "Python Chess"
+ENGINE_AUTHOR = "ssrtist"
+FILES = "abcdefgh"
+DEFAULT_DEPTH = 3
+MAX_DEPTH = 64
+MOVES_TO_GO = 30 # Assumed remaining moves when the GUI sends wtime/btime without movestogo
+MOVE_OVERHEAD = 0.05 # Seconds kept back per move for process and pipe latency
+
+def square_name(row: int, col: int) -> str:
+    return f"{FILES[col]}{8 - row}"
+
+def move_to_uci(piece, move) -> str:
+    target_row, target_col = move
+    text = square_name(piece.row, piece.col) + square_name(target_row, target_col)
+    if piece.type == PieceType.PAWN and target_row in (0, 7):
+        text += "q" # apply_move always promotes to a queen
+    return text
+
+def apply_uci_move(board: BoardState, text: str) -> BoardState:
+    if len(text) not in (4, 5):
+        raise ValueError(f"Invalid move {text}")
+    if len(text) == 5 and text[4] != "q":
+        raise ValueError(f"Underpromotion is not supported: {text}") # apply_move always promotes to a queen
+    from_col, from_row = FILES.index(text[0]), 8 - int(text[1])
+    to_col, to_row = FILES.index(text[2]), 8 - int(text[3])
+    piece = board.get_piece_at(from_row, from_col)
+    if piece is None or piece.color != board.current_turn:
+        raise ValueError(f"No piece to move for {text}")
+    if (to_row, to_col) not in board.calculate_possible_moves(piece):
+        raise ValueError(f"Illegal move {text}")
+    if len(text) == 5 and not (piece.type == PieceType.PAWN and to_row in (0, 7)):
+        raise ValueError(f"{text} is not a promotion")
+    return board.apply_move(piece, to_row, to_col)
+
+class UCIEngine:
+    def __init__(self, output=sys.stdout):
+        self.output = output
+        self.output_lock = threading.Lock()
+        self.ai = ChessAI(depth=DEFAULT_DEPTH)
+        self.board = BoardState() # None after a position command that could not be set up
+        self.search_thread = None
+        self.stop_event = threading.Event()
+
+    def send(self, line: str):
+        with self.output_lock:
+            self.output.write(line + "\n")
+            self.output.flush()
+
+    def handle(self, line: str) -> bool:
+        # Process one command line; returns False when the engine should exit
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, args = tokens[0], tokens[1:]
+        if command == "uci":
+            self.send(f"id name {ENGINE_NAME}")
+            self.send(f"id author {ENGINE_AUTHOR}")
+            self.send("uciok")
+        elif command == "isready":
+            self.send("readyok")
+        elif command == "ucinewgame":
+            self.stop()
+            self.board = BoardState()
+            self.ai.transposition_table.clear() # Results from the last game are no use in the next
+        elif command == "position":
+            self.stop()
+            self.set_position(args)
+        elif command == "go":
+            self.stop()
+            self.go(args)
+        elif command == "stop":
+            self.stop()
+        elif command == "quit":
+            self.stop()
+            return False
+        return True
+
+    def set_position(self, args):
+        if not args:
+            return
+        # A rejected position leaves no position at all, rather than the previous one, so go cannot search
+        # a position the GUI did not ask for
+        self.board = None
+        moves_at = args.index("moves") if "moves" in args else len(args)
+        if args[0] == "startpos":
+            board = BoardState()
+        elif args[0] == "fen":
+            try:
+                board = parse_fen(" ".join(args[1:moves_at]))
+            except ValueError as e:
+                self.send(f"info string invalid fen: {e}")
+                return
+        else:
+            self.send(f"info string unknown position type {args[0]}")
+            return
+        if moves_at < len(args):
+            try:
+                for text in args[moves_at + 1:]:
+                    board = apply_uci_move(board, text)
+            except (ValueError, IndexError) as e:
+                self.send(f"info string invalid move list: {e}")
+                return
+        self.board = board
+
+    def go(self, args):
+        limits = {}
+        i = 0
+        while i < len(args):
+            if args[i] == "infinite":
+                limits["infinite"] = True
+            elif i + 1 < len(args):
+                try:
+                    limits[args[i]] = int(args[i + 1])
+                except ValueError:
+                    pass
+                i += 1
+            i += 1
+
+        if self.board is None:
+            self.send("info string no valid position set")
+            self.send("bestmove 0000")
+            return
+        color = self.board.current_turn
+        depth = limits.get("depth")
+        time_limit = None
+        if "movetime" in limits:
+            time_limit = limits["movetime"] / 1000
+        elif not limits.get("infinite") and ("wtime" in limits or "btime" in limits):
+            remaining = limits.get("wtime" if color == PieceColor.WHITE else "btime", 0) / 1000
+            increment = limits.get("winc" if color == PieceColor.WHITE else "binc", 0) / 1000
+            moves_to_go = limits.get("movestogo", MOVES_TO_GO)
+            time_limit = max(0.01, min(remaining / moves_to_go + increment / 2, remaining - MOVE_OVERHEAD))
+        if depth is None:
+            depth = MAX_DEPTH if time_limit is not None or limits.get("infinite") else DEFAULT_DEPTH
+
+        self.stop_event = threading.Event()
+        self.search_thread = threading.Thread(target=self._search, args=(self.board, color, depth, time_limit, self.stop_event,
+                                                                         limits.get("infinite", False)), daemon=True)
+        self.search_thread.start()
+
+    def _search(self, board, color, depth, time_limit, stop_event, infinite):
+        start = time.perf_counter()
+
+        def report(depth, score, nodes, best_move):
+            elapsed = time.perf_counter() - start
+            # Mates found by the mate solver are scored MATE_SCORE less the plies to mate
+            score = f"mate {(MATE_SCORE - score + 1) // 2}" if score > MATE_SCORE - 1000 else f"cp {score}"
+            self.send(f"info depth {depth} score {score} nodes {nodes} nps {int(nodes / max(elapsed, 1e-6))} "
+                      f"time {int(elapsed * 1000)} pv {move_to_uci(*best_move)}")
+
+        best_move, _, _ = self.ai.search(board, color, max_depth=depth, time_limit=time_limit,
+                                         stop_event=stop_event, on_iteration=report)
+        if infinite: # The search may finish early, e.g. on a forced mate, but bestmove has to wait for stop
+            stop_event.wait()
+        self.send(f"bestmove {move_to_uci(*best_move) if best_move else '0000'}")
+
+    def stop(self):
+        if self.search_thread is not None:
+            self.stop_event.set()
+            self.search_thread.join()
+            self.search_thread = None
+
+def main():
+    engine = UCIEngine()
+    for line in sys.stdin:
+        if not engine.handle(line):
+            break
+    engine.stop()
+
+if __name__ == "__main__":
+    main()
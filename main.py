@@ -2,6 +2,8 @@ import pygame
 import time # Import time for delays
 from chess_logic import BoardState, PieceColor, PieceType, ChessPiece
 from chess_ai import ChessAI # Import ChessAI
+from chess_timeline import GameTimeline
+import chess_pgn
 
 # Initialize Pygame
 pygame.init()
@@ -32,6 +34,13 @@ FONT = pygame.font.Font(None, 74) # Default font, size 74
 # Animation settings
 ANIMATION_DURATION = 200 # milliseconds
 
+# Games are saved here as PGN when S is pressed
+PGN_FILE = "game.pgn"
+
+# Candidate moves highlighted when H is pressed
+HINT_LINES = 3
+AI_THINK_TIME = 0.5 # Seconds
+
 class Animation:
     def __init__(self, piece, start_pos, end_pos, start_time):
         self.piece = piece
@@ -325,138 +334,226 @@ possible_moves = []
 game_over = False
 game_result = ""
 last_move = None # Store the last move for animation (piece, start_row, start_col, end_row, end_col)
-
-# Game loop
-running = True
-while running:
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-        if event.type == pygame.MOUSEBUTTONDOWN and not game_over:
-            if board_state.current_turn == PieceColor.WHITE: # Only allow player input if it's White's turn
-                mouse_x, mouse_y = event.pos
-                clicked_col = mouse_x // SQUARE_SIZE
-                clicked_row = mouse_y // SQUARE_SIZE
-
-                if selected_piece is None:
-                    # Try to select a piece
-                    piece = board_state.get_piece_at(clicked_row, clicked_col)
-                    if piece and piece.color == board_state.current_turn:
-                        selected_piece = piece
-                        possible_moves = board_state.calculate_possible_moves(selected_piece)
-                else:
-                    # A piece is already selected, try to move it or change selection
-                    if (clicked_row, clicked_col) in possible_moves:
-                        # Valid move, initiate animation
-                        start_pos = (selected_piece.row, selected_piece.col)
-                        end_pos = (clicked_row, clicked_col)
-                        current_animation = Animation(selected_piece, start_pos, end_pos, pygame.time.get_ticks())
-                        last_move = (selected_piece, start_pos[0], start_pos[1], end_pos[0], end_pos[1])
-                        selected_piece = None
-                        possible_moves = []
-                    elif board_state.get_piece_at(clicked_row, clicked_col) == selected_piece:
-                        # Clicked on the same piece, deselect
-                        selected_piece = None
-                        possible_moves = []
-                    else:
-                        # Clicked elsewhere, deselect and try to select new piece
-                        selected_piece = None
-                        possible_moves = []
+hint_lines = [] # (move, score, line in SAN) for ChessAI.analyze's best lines, shown until the next move
+
+# Timeline: Left/Right step through the game, Home/End go to the start/live position, digits then Enter jump
+# to that ply, U or Backspace takes back the last move pair
+timeline = GameTimeline() # Every move played, with fast access to any earlier position
+view_ply = None # Ply shown while reviewing the game; None shows the live position
+ply_input = "" # Digits typed for a jump
+caption = ""
+
+if __name__ == "__main__":
+    # Game loop
+    running = True
+    while running:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_s:
+                # Save the game so far as PGN
+                with open(PGN_FILE, "w") as f:
+                    chess_pgn.write_game(f, timeline.played_moves(), {"Event": "Python Chess", "White": "Player", "Black": "ChessAI"},
+                                         chess_pgn.result_for(board_state))
+            if event.type == pygame.KEYDOWN and current_animation is None:
+                shown_ply = len(timeline) if view_ply is None else view_ply
+                if event.key == pygame.K_LEFT:
+                    view_ply = max(0, shown_ply - 1)
+                elif event.key == pygame.K_RIGHT:
+                    view_ply = shown_ply + 1 if shown_ply + 1 < len(timeline) else None
+                elif event.key == pygame.K_HOME:
+                    view_ply = 0
+                elif event.key == pygame.K_END:
+                    view_ply = None
+                elif pygame.K_0 <= event.key <= pygame.K_9:
+                    ply_input += chr(event.key)
+                elif event.key == pygame.K_RETURN and ply_input:
+                    view_ply = int(ply_input) if int(ply_input) < len(timeline) else None
+                    ply_input = ""
+                elif event.key in (pygame.K_u, pygame.K_BACKSPACE) and len(timeline) > 0:
+                    # Take back to the last position with White to move before the latest move
+                    undo_ply = len(timeline) - 1 if len(timeline) % 2 else len(timeline) - 2
+                    timeline.truncate(undo_ply)
+                    board_state = timeline.board_at(undo_ply)
+                    chess_ai.transposition_table.clear() # Searches after a takeback start from an empty table
+                    view_ply = None
+                    game_over = False
+                    game_result = ""
+                    display_check_message = False
+                    selected_piece = None
+                    possible_moves = []
+                    hint_lines = []
+                if event.key not in range(pygame.K_0, pygame.K_9 + 1):
+                    ply_input = ""
+                if view_ply is not None: # Board input is for the live position only
+                    selected_piece = None
+                    possible_moves = []
+                    hint_lines = []
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_h and not game_over and current_animation is None and view_ply is None:
+                # Show the best moves for White, searched to the AI's own depth
+                if board_state.current_turn == PieceColor.WHITE:
+                    lines, _ = chess_ai.analyze(board_state, PieceColor.WHITE, HINT_LINES, max_depth=chess_ai.depth)
+                    hint_lines = []
+                    for move, score, pv in lines:
+                        board, line = board_state, []
+                        for piece, (row, col) in pv:
+                            piece = board.get_piece_at(piece.row, piece.col) # The PV's pieces belong to other boards
+                            line.append(chess_pgn.move_to_san(board, piece, row, col))
+                            board = board.apply_move(piece, row, col)
+                        hint_lines.append((move, score, " ".join(line)))
+            if event.type == pygame.MOUSEBUTTONDOWN and not game_over and view_ply is None:
+                if board_state.current_turn == PieceColor.WHITE: # Only allow player input if it's White's turn
+                    mouse_x, mouse_y = event.pos
+                    clicked_col = mouse_x // SQUARE_SIZE
+                    clicked_row = mouse_y // SQUARE_SIZE
+
+                    if selected_piece is None:
+                        # Try to select a piece
                         piece = board_state.get_piece_at(clicked_row, clicked_col)
                         if piece and piece.color == board_state.current_turn:
                             selected_piece = piece
-                            possible_moves = board_state.calculate_possible_moves(selected_piece)
-
-    # AI's turn
-    if not game_over and board_state.current_turn == PieceColor.BLACK and current_animation is None: # Assuming AI plays as Black
-        time.sleep(0.5) # Small delay for AI to "think"
-        ai_move = chess_ai.find_best_move(board_state, PieceColor.BLACK)
-        if ai_move:
-            piece_to_move, target_square = ai_move
-            # Find the actual piece object from the current board_state
-            # This is important because the piece_to_move in ai_move might be an old instance
-            actual_piece = board_state.get_piece_at(piece_to_move.row, piece_to_move.col)
-            if actual_piece and actual_piece == piece_to_move: # Ensure it's the same piece
-                start_pos = (actual_piece.row, actual_piece.col)
-                end_pos = target_square
-                current_animation = Animation(actual_piece, start_pos, end_pos, pygame.time.get_ticks())
-                last_move = (actual_piece, start_pos[0], start_pos[1], end_pos[0], end_pos[1])
-        else:
-            # AI has no legal moves
-            if board_state.is_king_in_check(PieceColor.BLACK):
-                game_result = "Checkmate! White Wins!"
+                            possible_moves = timeline.legal_moves(len(timeline), selected_piece)
+                    else:
+                        # A piece is already selected, try to move it or change selection
+                        if (clicked_row, clicked_col) in possible_moves:
+                            # Valid move, initiate animation
+                            start_pos = (selected_piece.row, selected_piece.col)
+                            end_pos = (clicked_row, clicked_col)
+                            current_animation = Animation(selected_piece, start_pos, end_pos, pygame.time.get_ticks())
+                            last_move = (selected_piece, start_pos[0], start_pos[1], end_pos[0], end_pos[1])
+                            selected_piece = None
+                            possible_moves = []
+                        elif board_state.get_piece_at(clicked_row, clicked_col) == selected_piece:
+                            # Clicked on the same piece, deselect
+                            selected_piece = None
+                            possible_moves = []
+                        else:
+                            # Clicked elsewhere, deselect and try to select new piece
+                            selected_piece = None
+                            possible_moves = []
+                            piece = board_state.get_piece_at(clicked_row, clicked_col)
+                            if piece and piece.color == board_state.current_turn:
+                                selected_piece = piece
+                                possible_moves = timeline.legal_moves(len(timeline), selected_piece)
+
+        # AI's turn
+        if not game_over and board_state.current_turn == PieceColor.BLACK and current_animation is None and view_ply is None: # Assuming AI plays as Black
+            # The AI "thinks" for at least AI_THINK_TIME, and spends that time looking for a forced mate
+            think_start = time.perf_counter()
+            ai_move = chess_ai.find_best_move(board_state, PieceColor.BLACK, mate_time=AI_THINK_TIME)
+            time.sleep(max(0, AI_THINK_TIME - (time.perf_counter() - think_start)))
+            if ai_move:
+                piece_to_move, target_square = ai_move
+                # Find the actual piece object from the current board_state
+                # This is important because the piece_to_move in ai_move might be an old instance
+                actual_piece = board_state.get_piece_at(piece_to_move.row, piece_to_move.col)
+                if actual_piece and actual_piece == piece_to_move: # Ensure it's the same piece
+                    start_pos = (actual_piece.row, actual_piece.col)
+                    end_pos = target_square
+                    current_animation = Animation(actual_piece, start_pos, end_pos, pygame.time.get_ticks())
+                    last_move = (actual_piece, start_pos[0], start_pos[1], end_pos[0], end_pos[1])
             else:
-                game_result = "Stalemate!"
-            game_over = True
+                # AI has no legal moves
+                if board_state.is_king_in_check(PieceColor.BLACK):
+                    game_result = "Checkmate! White Wins!"
+                else:
+                    game_result = "Stalemate!"
+                game_over = True
 
 
-    # Handle animation
-    if current_animation:
-        elapsed_time = pygame.time.get_ticks() - current_animation.start_time
-        animation_progress = min(1.0, elapsed_time / ANIMATION_DURATION)
-
-        if animation_progress < 1.0:
-            # Interpolate position
-            start_row, start_col = current_animation.start_pos
-            end_row, end_col = current_animation.end_pos
-            current_row = start_row + (end_row - start_row) * animation_progress
-            current_col = start_col + (end_col - start_col) * animation_progress
-            current_animation.current_pos = (current_row, current_col)
-        else:
-            # Animation finished, apply the move to the board_state
-            piece_to_move = current_animation.piece
-            target_row, target_col = current_animation.end_pos
-
-            # Check if a piece was captured at the target square
-            captured_piece_at_target = board_state.get_piece_at(target_row, target_col)
-            if captured_piece_at_target and captured_piece_at_target.color != piece_to_move.color:
-                display_capture_effect = True
-                capture_effect_square = (target_row, target_col)
-                capture_effect_start_time = pygame.time.get_ticks()
-
-            board_state = board_state.apply_move(piece_to_move, target_row, target_col)
-            current_animation = None
-
-            # After move, check for game over conditions and switch turn
-            if not game_over:
-                if board_state.is_checkmate(board_state.current_turn):
-                    game_result = f"Checkmate! {'White' if board_state.current_turn == PieceColor.BLACK else 'Black'} Wins!"
-                    game_over = True
-                elif board_state.is_stalemate(board_state.current_turn):
-                    game_result = "Stalemate!"
-                    game_over = True
-                elif board_state.is_king_in_check(board_state.current_turn):
-                    display_check_message = True
-                    check_message_start_time = pygame.time.get_ticks()
-
-
-    # Draw the board
-    draw_board(SCREEN)
-    # Draw highlights
-    draw_highlights(SCREEN, selected_piece, possible_moves)
-    # Draw the pieces
-    draw_pieces(SCREEN, board_state, current_animation)
-
-    # Display game over message if applicable
-    if game_over:
-        display_message(SCREEN, game_result)
-    elif display_check_message:
-        if pygame.time.get_ticks() - check_message_start_time < CHECK_MESSAGE_DURATION:
-            display_message(SCREEN, "Check!")
-        else:
-            display_check_message = False
+        # Handle animation
+        if current_animation:
+            elapsed_time = pygame.time.get_ticks() - current_animation.start_time
+            animation_progress = min(1.0, elapsed_time / ANIMATION_DURATION)
 
-    # Display capture effect if applicable
-    if display_capture_effect:
-        if pygame.time.get_ticks() - capture_effect_start_time < CAPTURED_EFFECT_DURATION:
-            s = pygame.Surface((SQUARE_SIZE, SQUARE_SIZE), pygame.SRCALPHA)
-            s.fill((255, 0, 0, 128)) # Red with 50% transparency
-            SCREEN.blit(s, (capture_effect_square[1] * SQUARE_SIZE, capture_effect_square[0] * SQUARE_SIZE))
+            if animation_progress < 1.0:
+                # Interpolate position
+                start_row, start_col = current_animation.start_pos
+                end_row, end_col = current_animation.end_pos
+                current_row = start_row + (end_row - start_row) * animation_progress
+                current_col = start_col + (end_col - start_col) * animation_progress
+                current_animation.current_pos = (current_row, current_col)
+            else:
+                # Animation finished, apply the move to the board_state
+                piece_to_move = current_animation.piece
+                target_row, target_col = current_animation.end_pos
+
+                # Check if a piece was captured at the target square
+                captured_piece_at_target = board_state.get_piece_at(target_row, target_col)
+                if captured_piece_at_target and captured_piece_at_target.color != piece_to_move.color:
+                    display_capture_effect = True
+                    capture_effect_square = (target_row, target_col)
+                    capture_effect_start_time = pygame.time.get_ticks()
+
+                board_state = timeline.push(piece_to_move, (target_row, target_col))
+                current_animation = None
+                hint_lines = []
+
+                # After move, check for game over conditions and switch turn
+                if not game_over:
+                    if board_state.is_checkmate(board_state.current_turn):
+                        game_result = f"Checkmate! {'White' if board_state.current_turn == PieceColor.BLACK else 'Black'} Wins!"
+                        game_over = True
+                    elif board_state.is_stalemate(board_state.current_turn):
+                        game_result = "Stalemate!"
+                        game_over = True
+                    elif board_state.is_threefold_repetition():
+                        game_result = "Draw by repetition!"
+                        game_over = True
+                    elif board_state.is_fifty_move_draw():
+                        game_result = "Draw by 50-move rule!"
+                        game_over = True
+                    elif board_state.is_king_in_check(board_state.current_turn):
+                        display_check_message = True
+                        check_message_start_time = pygame.time.get_ticks()
+
+
+        # Draw the board
+        draw_board(SCREEN)
+        # Draw highlights
+        draw_highlights(SCREEN, selected_piece, possible_moves)
+        for (piece, move), _, _ in hint_lines:
+            draw_highlights(SCREEN, piece, [move])
+        # Draw the pieces
+        if view_ply is None:
+            draw_pieces(SCREEN, board_state, current_animation)
         else:
-            display_capture_effect = False
+            if view_ply > 0: # The move that led to the reviewed position
+                piece, move = timeline.move_at(view_ply - 1)
+                draw_highlights(SCREEN, piece, [move])
+            draw_pieces(SCREEN, timeline.board_at(view_ply), None)
+
+        # Ply and evaluation in the window title, plus the best hint line while hints are shown; evaluations of
+        # revisited positions come from the AI's cache
+        shown_ply = len(timeline) if view_ply is None else view_ply
+        score = chess_ai.evaluate_board(timeline.board_at(shown_ply), PieceColor.WHITE)
+        new_caption = f"Python Chess - ply {shown_ply}/{len(timeline)}{' (review)' if view_ply is not None else ''}, eval {score / 100:+.2f}"
+        if hint_lines:
+            new_caption += f", hint {hint_lines[0][1] / 100:+.2f} {hint_lines[0][2]}"
+        if new_caption != caption:
+            caption = new_caption
+            pygame.display.set_caption(caption)
+
+        # Display game over message if applicable; reviewed positions get no messages
+        if game_over and view_ply is None:
+            display_message(SCREEN, game_result)
+        elif display_check_message and view_ply is None:
+            if pygame.time.get_ticks() - check_message_start_time < CHECK_MESSAGE_DURATION:
+                display_message(SCREEN, "Check!")
+            else:
+                display_check_message = False
+
+        # Display capture effect if applicable
+        if display_capture_effect:
+            if pygame.time.get_ticks() - capture_effect_start_time < CAPTURED_EFFECT_DURATION:
+                s = pygame.Surface((SQUARE_SIZE, SQUARE_SIZE), pygame.SRCALPHA)
+                s.fill((255, 0, 0, 128)) # Red with 50% transparency
+                SCREEN.blit(s, (capture_effect_square[1] * SQUARE_SIZE, capture_effect_square[0] * SQUARE_SIZE))
+            else:
+                display_capture_effect = False
 
-    # Update the display
-    pygame.display.flip()
+        # Update the display
+        pygame.display.flip()
 
-# Quit Pygame
-pygame.quit()
\ No newline at end of file
+    # Quit Pygame
+    pygame.quit()
\ No newline at end of file